@@ -0,0 +1,320 @@
+"""
+Benchmarks for text and ascii art rendering.
+
+Every case runs in a fresh process, which reports wall time (median over
+repeats), encode time, peak RSS and output size. Results are compared against
+a stored baseline, the script exits with 1 if any case got worse by more than
+the tolerance.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+
+from io import BytesIO
+from typing import Callable
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.abspath(os.path.dirname(__file__))
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+SRC_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "src")
+SEED = 1
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+# Changes smaller than this are noise, whatever the relative change.
+MIN_SECONDS_CHANGE = 0.01
+# Wall time on shared machines varies a lot between runs, cases that look
+# slower are measured again this often and the fastest result is kept.
+CONFIRM_RUNS = 2
+
+# Words cycle through these to get a realistic mix of known and unknown words.
+VOCABULARY = "baba is You keke is Win rock is not Push flag and wall is Stop".split()
+
+
+def make_text(word_count: int, words_per_line: int) -> str:
+    words = [VOCABULARY[i % len(VOCABULARY)] for i in range(word_count)]
+    lines = [
+        " ".join(words[i : i + words_per_line])
+        for i in range(0, word_count, words_per_line)
+    ]
+    return "\n".join(lines)
+
+
+def make_image(frame_count: int, size: tuple[int, int] = (320, 240)) -> BytesIO:
+    """
+    A seeded colorful test image, animated if frame_count > 1.
+    """
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(SEED)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    frames = []
+    for frame in range(frame_count):
+        image = np.empty((height, width, 4), dtype=np.uint8)
+        image[:, :, 0] = (x + 8 * frame) % 256
+        image[:, :, 1] = (y * 255 // height).astype(np.uint8)
+        image[:, :, 2] = rng.integers(0, 256, size=(height, width))
+        image[:, :, 3] = 255
+        frames.append(Image.fromarray(image, "RGBA"))
+
+    result = BytesIO()
+    if frame_count == 1:
+        frames[0].save(result, format="png")
+    else:
+        frames[0].save(
+            result, format="gif", save_all=True, append_images=frames[1:], duration=50
+        )
+    return result
+
+
+def text_case(
+    word_count: int, words_per_line: int, output_format: str = "gif"
+) -> Callable[[], Callable[[], bytes]]:
+    def setup() -> Callable[[], bytes]:
+        from baba_text.animated_text import AnimatedText
+
+        text = make_text(word_count, words_per_line)
+        return lambda: (
+            AnimatedText(text, seed=SEED).write_to_buffer(output_format).getvalue()
+        )
+
+    return setup
+
+
+def layout_case() -> Callable[[], bytes]:
+    from baba_text.animated_text import AnimatedText
+
+    text = (
+        "\n\t\tkeke\t\t\trock\n\t\tis\t\t\tis\n"
+        "\t\tnot\t\t\tSink\nbaba is You\t\t\tand"
+    )
+    return lambda: AnimatedText(text, seed=SEED).write_to_buffer().getvalue()
+
+
+def ascii_case(
+    pixels_per_character: int, frame_count: int, mode: str, output_format: str = "gif"
+) -> Callable[[], Callable[[], bytes]]:
+    def setup() -> Callable[[], bytes]:
+        from baba_text.animated_ascii_art import AnimatedAsciiArt
+        from baba_text.constants import ASCII_COLOR_PALETTE
+
+        image = make_image(frame_count)
+
+        def run() -> bytes:
+            image.seek(0)
+            return (
+                AnimatedAsciiArt(
+                    image,
+                    pixels_per_character,
+                    greyscale=mode == "grey",
+                    color_palette=ASCII_COLOR_PALETTE if mode == "palette" else None,
+                    seed=SEED,
+                )
+                .write_to_buffer(output_format)
+                .getvalue()
+            )
+
+        return run
+
+    return setup
+
+
+def import_case() -> Callable[[], bytes]:
+    # Only meaningful on the first run of a process, see run_case.
+    import baba_text.animated_text  # noqa: F401
+    import baba_text.animated_ascii_art  # noqa: F401
+
+    return lambda: b""
+
+
+# Name -> setup function returning the function to time.
+CASES: dict[str, Callable[[], Callable[[], bytes]]] = {
+    "import": import_case,
+    "text_1_word": text_case(1, 1),
+    "text_10_words": text_case(10, 10),
+    "text_100_words": text_case(100, 10),
+    "text_1000_words": text_case(1000, 32),
+    "text_layout": layout_case,
+    "ascii_grey_ppc_5": ascii_case(5, 1, "grey"),
+    "ascii_grey_ppc_10": ascii_case(10, 1, "grey"),
+    "ascii_grey_ppc_20": ascii_case(20, 1, "grey"),
+    "ascii_color_ppc_5": ascii_case(5, 1, "color"),
+    "ascii_color_ppc_10": ascii_case(10, 1, "color"),
+    "ascii_color_ppc_20": ascii_case(20, 1, "color"),
+    "ascii_palette_ppc_10": ascii_case(10, 1, "palette"),
+    "ascii_grey_ppc_10_frames_10": ascii_case(10, 10, "grey"),
+    "ascii_grey_ppc_10_frames_30": ascii_case(10, 30, "grey"),
+    "ascii_color_ppc_10_frames_10": ascii_case(10, 10, "color"),
+}
+# The same renderings in the other output formats, to compare them with gif.
+for output_format in ("webp", "webp-lossy", "apng", "sprite-sheet"):
+    suffix = "_as_" + output_format.replace("-", "_")
+    CASES["text_100_words" + suffix] = text_case(100, 10, output_format)
+    CASES["ascii_grey_ppc_10" + suffix] = ascii_case(10, 1, "grey", output_format)
+    CASES["ascii_color_ppc_10" + suffix] = ascii_case(10, 1, "color", output_format)
+    CASES["ascii_color_ppc_10_frames_10" + suffix] = ascii_case(
+        10, 10, "color", output_format
+    )
+
+
+def run_case(name: str, repeat: int) -> dict:
+    """
+    Runs inside the benchmark process, measures one case.
+    """
+    start = time.perf_counter()
+    run = CASES[name]()
+    setup_seconds = time.perf_counter() - start
+
+    from baba_text.instrumentation import collect_metrics
+
+    durations = []
+    encode_durations = []
+    output = b""
+    for _ in range(repeat):
+        with collect_metrics() as metrics:
+            start = time.perf_counter()
+            output = run()
+            durations.append(time.perf_counter() - start)
+        encode_durations.append(
+            metrics.stage_seconds.get("gif_write", 0.0)
+            + metrics.stage_seconds.get("image_write", 0.0)
+        )
+
+    return {
+        # Importing is all the import case does.
+        "seconds": setup_seconds if name == "import" else statistics.median(durations),
+        "encode_seconds": statistics.median(encode_durations),
+        "output_bytes": len(output),
+    }
+
+
+def measure_case(name: str, repeat: int) -> dict:
+    """
+    Run a case in a fresh process, so imports are cold and peak RSS is its own.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (SRC_DIR, env.get("PYTHONPATH")) if path
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--run-case",
+            name,
+            "--repeat",
+            str(repeat),
+        ],
+        stdout=subprocess.PIPE,
+        env=env,
+    )
+    assert process.stdout is not None
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Benchmark {name} failed with exit code {process.returncode}"
+        )
+
+    result = json.loads(output)
+    # ru_maxrss is in kilobytes on linux.
+    result["peak_rss_bytes"] = usage.ru_maxrss * 1024
+    return result
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for metric in ("seconds", "peak_rss_bytes", "output_bytes"):
+        if metric not in baseline or baseline[metric] == 0:
+            continue
+        if metric == "seconds" and (
+            result[metric] - baseline[metric] < MIN_SECONDS_CHANGE
+        ):
+            continue
+        change = result[metric] / baseline[metric] - 1
+        if change > tolerance:
+            regressions.append(f"{metric} +{100 * change:.0f}%")
+    return regressions
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(
+        prog="run_benchmarks",
+        description="Benchmark rendering and compare against a baseline",
+    )
+    parser.add_argument(
+        "-k", "--filter", default="", help="Only run cases whose name contains this"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per case"
+    )
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Allowed relative regression before failing, 0.25 = 25%%",
+    )
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        default=False,
+        help="Store the results as the new baseline instead of comparing",
+    )
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case is not None:
+        print(json.dumps(run_case(args.run_case, args.repeat)))
+        return
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+
+    names = [name for name in CASES if args.filter in name]
+    width = max(len(name) for name in names) if names else 0
+    results = {}
+    failed = False
+    print(f"{'case':{width}} {'seconds':>9} {'encode':>9} {'rss MB':>8} {'bytes':>10}")
+    for name in names:
+        result = measure_case(name, args.repeat)
+        regressions = compare(result, baseline.get(name, {}), args.tolerance)
+        for _ in range(CONFIRM_RUNS):
+            if not regressions or args.update_baseline:
+                break
+            retry = measure_case(name, args.repeat)
+            if retry["seconds"] < result["seconds"]:
+                result = retry
+            regressions = compare(result, baseline.get(name, {}), args.tolerance)
+        results[name] = result
+        failed = failed or len(regressions) > 0
+        print(
+            f"{name:{width}} {result['seconds']:9.4f} {result['encode_seconds']:9.4f} "
+            f"{result['peak_rss_bytes'] / 2**20:8.1f} {result['output_bytes']:10d}"
+            + ("  REGRESSION: " + ", ".join(regressions) if regressions else "")
+        )
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Updated baseline {args.baseline}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,19 +1,34 @@
-import multiprocessing.queues
+import asyncio
 import discord
+from discord import app_commands
 from discord.ext import commands
-import multiprocessing
+from aiohttp import web
+from typing import Any, Callable
 import os
-import queue
-import traceback
 import logging
 from io import BytesIO
 from PIL import Image
 import math
 
-from baba_text.constants import get_allowed_characters, TRANSPARENT_COLOR
+from baba_text.constants import (
+    get_allowed_characters,
+    get_ascii_color_ramp,
+    TRANSPARENT_COLOR,
+    KNOWN_WORDS_TO_COLOR,
+    RENDER_PRIORITY_CHEAP,
+    RENDER_PRIORITY_EXPENSIVE,
+    OUTPUT_FORMAT_GIF,
+    OUTPUT_FORMATS,
+)
 from baba_text.color import Color
 from baba_text.animated_text import AnimatedText
 from baba_text.animated_ascii_art import AnimatedAsciiArt
+from baba_text.result_cache import ResultCache
+from baba_text.word_tiles import WORD_TILE_CACHE
+from baba_text.sprite_atlas import get_sprite_atlas
+from baba_text.render_pool import RenderPool
+from baba_text.render_scheduler import RenderScheduler, RenderRejectedError
+from baba_text.instrumentation import Metrics, collect_metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,8 +39,26 @@ logging.basicConfig(
 BOT_SAY_REQUEST_TIMEOUT_SECONDS = 10
 BOT_DRAW_REQUEST_TIMEOUT_SECONDS = 30
 ASCII_MAX_DIMENSION = 64
+ASCII_MAX_INPUT_FRAMES = 1000
+ASCII_MAX_INPUT_PIXELS = 2**28
+ASCII_TARGET_FPS = 15
+RENDER_WORKER_COUNT = os.cpu_count() or 1
+RENDER_MAX_QUEUED_JOBS = 8 * RENDER_WORKER_COUNT
+# Rates are jobs per second, bursts are how many jobs may come at once.
+RENDER_GUILD_RATE = 0.5
+RENDER_GUILD_BURST = 10
+RENDER_USER_RATE = 0.1
+RENDER_USER_BURST = 3
 ALLOWED_CHARACTERS = get_allowed_characters()
 DISCORD_BOT_TOKEN_ENV_VAR = "DISCORD_BOT_TOKEN"
+RESULT_CACHE_DIR_ENV_VAR = "BABA_RESULT_CACHE_DIR"
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_MAX_DISK_BYTES = 4 * 1024 * 1024 * 1024
+METRICS_PORT_ENV_VAR = "BABA_METRICS_PORT"
+OUTPUT_FORMAT_CHOICES = [
+    app_commands.Choice(name=output_format, value=output_format)
+    for output_format in OUTPUT_FORMATS
+]
 
 # Certain sequences arrive in escaped form from discord.
 # The following sequences are "unescaped" with their replacements:
@@ -40,6 +73,17 @@ UNESCAPE_SEQUENCES = [
 
 ALTERNATE_BACKGROUND_COLOR = Color(49, 51, 56)
 
+# Rendering metrics sent back by the workers, summed up.
+RENDER_METRICS = Metrics()
+
+# Users repeat the same messages a lot, answer those without rendering.
+# Set the env var to keep results on disk across restarts.
+RESULT_CACHE = ResultCache(
+    RESULT_CACHE_MAX_BYTES,
+    directory=os.getenv(RESULT_CACHE_DIR_ENV_VAR),
+    max_disk_bytes=RESULT_CACHE_MAX_DISK_BYTES,
+)
+
 
 class YesNoDialog(discord.ui.View):
     def __init__(self, attachment: discord.File, original_interaction: discord.Interaction, timeout: float | None = 180):
@@ -69,28 +113,129 @@ def preprocess_message(message: str) -> str:
     return message
 
 
-def run_baba_says(
-    text: str, transparent_background: bool, output_queue: multiprocessing.Queue
+def get_background_color(transparent_background: bool) -> Color:
+    return TRANSPARENT_COLOR if transparent_background else ALTERNATE_BACKGROUND_COLOR
+
+
+def get_baba_draws_cache_key(
+    image_data: bytes,
+    transparent_background: bool,
+    greyscale: bool,
+    output_format: str = OUTPUT_FORMAT_GIF,
+) -> str:
+    # The characters per pixel follow from the image and ASCII_MAX_DIMENSION.
+    return ResultCache.make_key(
+        AnimatedAsciiArt.get_cache_key(
+            image_data,
+            greyscale=greyscale,
+            background_color=get_background_color(transparent_background),
+            target_fps=ASCII_TARGET_FPS,
+            output_format=output_format,
+        ),
+        ASCII_MAX_DIMENSION,
+    )
+
+
+async def send_preview(
+    interaction: discord.Interaction,
+    result: BytesIO,
+    output_format: str = OUTPUT_FORMAT_GIF,
 ) -> None:
+    await interaction.edit_original_response(content="baba is considering...")
+    result_attachment = discord.File(
+        result, filename=f"baba_text.{OUTPUT_FORMATS[output_format]}"
+    )
+    await interaction.followup.send(
+        content="baba has preview. message is send?",
+        file=result_attachment,
+        view=YesNoDialog(result_attachment, interaction),
+        ephemeral=True
+    )
 
-    try:
-        animated_text = AnimatedText(
-            text,
-            TRANSPARENT_COLOR if transparent_background else ALTERNATE_BACKGROUND_COLOR,
-        )
-        output_queue.put(animated_text.write_to_buffer())
-    except:
-        logging.error(traceback.format_exc())
-        output_queue.put(None)
+
+def warm_render_caches() -> None:
+    """
+    Load everything rendering needs once, before the render workers fork.
+    """
+    Image.init()
+    get_ascii_color_ramp()
+    get_sprite_atlas()
+    WORD_TILE_CACHE.warm(KNOWN_WORDS_TO_COLOR)
+    logging.info(f"Warmed {len(WORD_TILE_CACHE)} word tiles")
+
+
+def run_instrumented(function: Callable, *args: Any) -> tuple[Any, Metrics]:
+    """
+    Run function in a worker and send its metrics back with the result.
+    """
+    with collect_metrics() as metrics:
+        result = function(*args)
+    return result, metrics
+
+
+async def get_cached_result(key: str) -> BytesIO | None:
+    """
+    Cached output for key, files are read off the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, RESULT_CACHE.get, key
+    )
+
+
+async def put_cached_result(key: str, result: bytes) -> None:
+    """
+    Cache result, files are written off the event loop.
+    """
+    await asyncio.get_running_loop().run_in_executor(
+        None, RESULT_CACHE.put, key, result
+    )
+
+
+def format_bot_metrics(render_scheduler: RenderScheduler) -> str:
+    """
+    Rendering metrics plus the state of the bot itself in prometheus format.
+    """
+    stats = render_scheduler.stats
+    cache_stats = RESULT_CACHE.stats
+    gauges = {
+        "render_queue_depth": render_scheduler.queue_depth,
+        "render_running_jobs": render_scheduler.running,
+        "render_max_wait_seconds": stats.max_wait_seconds,
+        "result_cache_bytes": RESULT_CACHE.size_bytes,
+        "result_cache_disk_bytes": RESULT_CACHE.disk_size_bytes,
+    }
+    counters = {
+        "render_admitted_total": stats.admitted,
+        "render_rejected_queue_full_total": stats.rejected_queue_full,
+        "render_rejected_rate_limited_total": stats.rejected_rate_limited,
+        "render_completed_total": stats.completed,
+        "render_wait_seconds_total": stats.total_wait_seconds,
+        "result_cache_hits_total": cache_stats.hits + cache_stats.disk_hits,
+        "result_cache_misses_total": cache_stats.misses,
+    }
+
+    lines = [RENDER_METRICS.to_prometheus().rstrip("\n")]
+    for kind, values in (("gauge", gauges), ("counter", counters)):
+        for name, value in values.items():
+            lines.append(f"# TYPE baba_text_{name} {kind}")
+            lines.append(f"baba_text_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def run_baba_says(
+    text: str, transparent_background: bool, output_format: str = OUTPUT_FORMAT_GIF
+) -> bytes:
+    animated_text = AnimatedText(text, get_background_color(transparent_background))
+    return animated_text.write_to_buffer(output_format).getvalue()
 
 
 def run_baba_draws(
-    input_image: BytesIO,
+    image_data: bytes,
     transparent_background: bool,
     greyscale: bool,
-    output_queue: multiprocessing.Queue,
-) -> None:
-
+    output_format: str = OUTPUT_FORMAT_GIF,
+) -> bytes:
+    input_image = BytesIO(image_data)
     image = Image.open(input_image)
     longer_side = max(image.width, image.height)
     pixels_per_character = (
@@ -102,19 +247,16 @@ def run_baba_draws(
     logging.info(
         f"Image: ({image.width}, {image.height}) -> ppc = {pixels_per_character}"
     )
-    try:
-        art = AnimatedAsciiArt(
-            input_image,
-            pixels_per_character=pixels_per_character,
-            greyscale=greyscale,
-            background_color=TRANSPARENT_COLOR
-            if transparent_background
-            else ALTERNATE_BACKGROUND_COLOR,
-        )
-        output_queue.put(art.write_to_buffer())
-    except:
-        logging.error(traceback.format_exc())
-        output_queue.put(None)
+    art = AnimatedAsciiArt(
+        input_image,
+        pixels_per_character=pixels_per_character,
+        greyscale=greyscale,
+        background_color=get_background_color(transparent_background),
+        target_fps=ASCII_TARGET_FPS,
+        max_input_frames=ASCII_MAX_INPUT_FRAMES,
+        max_input_pixels=ASCII_MAX_INPUT_PIXELS,
+    )
+    return art.write_to_buffer(output_format).getvalue()
 
 
 def load_bot_token() -> str:
@@ -131,6 +273,31 @@ def load_bot_token() -> str:
 if __name__ == "__main__":
     discord_bot_token = load_bot_token()
 
+    # Rendering runs in separate processes, this way we ensure
+    # no potential issues leak into the bot.
+    warm_render_caches()
+    render_pool = RenderPool(RENDER_WORKER_COUNT)
+    logging.info(f"Started {RENDER_WORKER_COUNT} render workers")
+
+    # Jobs beyond what the workers can take wait here, fairly shared between guilds.
+    render_scheduler = RenderScheduler(
+        render_pool,
+        RENDER_WORKER_COUNT,
+        RENDER_MAX_QUEUED_JOBS,
+        RENDER_GUILD_RATE,
+        RENDER_GUILD_BURST,
+        RENDER_USER_RATE,
+        RENDER_USER_BURST,
+    )
+
+    async def send_busy(interaction: discord.Interaction, reason: Exception) -> None:
+        logging.warning(
+            f"Rejected request for guild '{interaction.guild}': {reason} "
+            f"(queue depth {render_scheduler.queue_depth})"
+        )
+        await interaction.delete_original_response()
+        await interaction.followup.send("baba is busy. you is wait.", ephemeral=True)
+
     intents = discord.Intents.default()
     intents.message_content = True
     bot = commands.Bot(command_prefix="!", intents=intents)
@@ -140,6 +307,22 @@ if __name__ == "__main__":
     async def on_ready() -> None:
         logging.info(f"Logged in as: {bot.user}")
 
+    async def serve_metrics(_: web.Request) -> web.Response:
+        return web.Response(text=format_bot_metrics(render_scheduler))
+
+    async def setup_hook() -> None:
+        metrics_port = os.getenv(METRICS_PORT_ENV_VAR)
+        if metrics_port is None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", serve_metrics)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, port=int(metrics_port)).start()
+        logging.info(f"Serving metrics on port {metrics_port}")
+
+    bot.setup_hook = setup_hook
+
     @bot.event
     async def on_guild_join(guild: discord.Guild) -> None:
         logging.info(f"Joined guild {guild} as '{bot.user}'")
@@ -154,8 +337,12 @@ if __name__ == "__main__":
 
     # Commands
     @bot.tree.command()
+    @app_commands.choices(output_format=OUTPUT_FORMAT_CHOICES)
     async def baba_says(
-        interaction: discord.Interaction, text: str, transparent_background: bool = True
+        interaction: discord.Interaction,
+        text: str,
+        transparent_background: bool = True,
+        output_format: str = OUTPUT_FORMAT_GIF,
     ) -> None:
         """
         Converts your message to baba style gif.
@@ -180,50 +367,65 @@ if __name__ == "__main__":
                 )
                 return
 
-        # Run conversion in separate process, this way we ensure
-        # no potential issues leak into the bot.
-        output_queue: multiprocessing.Queue = multiprocessing.Queue()
-        process = multiprocessing.Process(
-            target=run_baba_says,
-            args=(message, transparent_background, output_queue),
+        cache_key = AnimatedText.get_cache_key(
+            message,
+            get_background_color(transparent_background),
+            output_format=output_format,
         )
-        process.start()
+        cached = await get_cached_result(cache_key)
+        if cached is not None:
+            logging.info(
+                f"Answered message of length {len(text)} from cache "
+                f"(hit rate {RESULT_CACHE.stats.hit_rate:.2f})"
+            )
+            await send_preview(interaction, cached, output_format)
+            return
 
         try:
-            result = output_queue.get(timeout=BOT_SAY_REQUEST_TIMEOUT_SECONDS)
-        except queue.Empty:
+            result, metrics = await render_scheduler.submit(
+                run_instrumented,
+                run_baba_says,
+                message,
+                transparent_background,
+                output_format,
+                guild=interaction.guild_id,
+                user=interaction.user.id,
+                priority=RENDER_PRIORITY_CHEAP,
+                timeout=BOT_SAY_REQUEST_TIMEOUT_SECONDS,
+            )
+        except RenderRejectedError as e:
+            await send_busy(interaction, e)
+        except TimeoutError:
             await interaction.delete_original_response()
             await interaction.followup.send(
                 "text is long. baba is sad.", ephemeral=True
             )
+        except RuntimeError as e:
+            logging.error(e)
+            await interaction.delete_original_response()
+            await interaction.followup.send(
+                "text has error. baba is sad.",
+                ephemeral=True,
+            )
         else:
-            process.join(timeout=1)
-            if process.exitcode != 0 or result is None:
-                await interaction.delete_original_response()
-                await interaction.followup.send(
-                    "text has error. baba is sad.",
-                    ephemeral=True,
-                )
-            else:
-                await interaction.edit_original_response(content="baba is considering...")
-                result_attachment = discord.File(result, filename="baba_text.gif")
-                await interaction.followup.send(
-                    content="baba has preview. message is send?",
-                    file=result_attachment,
-                    view=YesNoDialog(result_attachment, interaction),
-                    ephemeral=True
-                )
+            RENDER_METRICS.merge(metrics)
+            await send_preview(interaction, BytesIO(result), output_format)
+            await put_cached_result(cache_key, result)
         finally:
             logging.info(
                 f"Processed message of length {len(text)} for guild '{interaction.guild}'"
+                f" (queue depth {render_scheduler.queue_depth},"
+                f" max wait {render_scheduler.stats.max_wait_seconds:.2f}s)"
             )
 
     @bot.tree.command()
+    @app_commands.choices(output_format=OUTPUT_FORMAT_CHOICES)
     async def baba_draws(
         interaction: discord.Interaction,
         image: discord.Attachment,
         transparent_background: bool = True,
         greyscale: bool = False,
+        output_format: str = OUTPUT_FORMAT_GIF,
     ) -> None:
         logging.info(
             f"Processing image '{image.filename}' for guild '{interaction.guild}'"
@@ -235,41 +437,53 @@ if __name__ == "__main__":
         buffer.write(await image.read())
         logging.info(f"Image size in bytes: {buffer.tell()}")
 
-        # Run conversion in separate process, this way we ensure
-        # no potential issues leak into the bot.
-        output_queue: multiprocessing.Queue = multiprocessing.Queue()
-        process = multiprocessing.Process(
-            target=run_baba_draws,
-            args=(buffer, transparent_background, greyscale, output_queue),
+        cache_key = get_baba_draws_cache_key(
+            buffer.getvalue(), transparent_background, greyscale, output_format
         )
-        process.start()
+        cached = await get_cached_result(cache_key)
+        if cached is not None:
+            logging.info(
+                f"Answered image '{image.filename}' from cache "
+                f"(hit rate {RESULT_CACHE.stats.hit_rate:.2f})"
+            )
+            await send_preview(interaction, cached, output_format)
+            return
 
         try:
-            result = output_queue.get(timeout=BOT_DRAW_REQUEST_TIMEOUT_SECONDS)
-        except queue.Empty:
+            result, metrics = await render_scheduler.submit(
+                run_instrumented,
+                run_baba_draws,
+                buffer.getvalue(),
+                transparent_background,
+                greyscale,
+                output_format,
+                guild=interaction.guild_id,
+                user=interaction.user.id,
+                priority=RENDER_PRIORITY_EXPENSIVE,
+                timeout=BOT_DRAW_REQUEST_TIMEOUT_SECONDS,
+            )
+        except RenderRejectedError as e:
+            await send_busy(interaction, e)
+        except TimeoutError:
             await interaction.delete_original_response()
             await interaction.followup.send(
                 "image is big. baba is sad.", ephemeral=True
             )
+        except RuntimeError as e:
+            logging.error(e)
+            await interaction.delete_original_response()
+            await interaction.followup.send(
+                "image has error. baba is sad. format is not supported.", ephemeral=True
+            )
         else:
-            process.join(timeout=1)
-            if process.exitcode != 0 or result is None:
-                await interaction.delete_original_response()
-                await interaction.followup.send(
-                    "image has error. baba is sad. format is not supported.", ephemeral=True
-                )
-            else:
-                await interaction.edit_original_response(content="baba is considering...")
-                result_attachment = discord.File(result, filename="baba_text.gif")
-                await interaction.followup.send(
-                    content="baba has preview. message is send?",
-                    file=result_attachment,
-                    view=YesNoDialog(result_attachment, interaction),
-                    ephemeral=True
-                )
+            RENDER_METRICS.merge(metrics)
+            await send_preview(interaction, BytesIO(result), output_format)
+            await put_cached_result(cache_key, result)
         finally:
             logging.info(
                 f"Processed image '{image.filename}' for guild '{interaction.guild}'"
+                f" (queue depth {render_scheduler.queue_depth},"
+                f" max wait {render_scheduler.stats.max_wait_seconds:.2f}s)"
             )
 
     @bot.command()
@@ -1,31 +1,36 @@
-from PIL import Image
-from typing import BinaryIO
+from PIL import Image, UnidentifiedImageError
+from typing import BinaryIO, Iterator
 import numpy as np
 import math
+import hashlib
 from .constants import (
     TRANSPARENT_COLOR,
     ANIMATION_FRAME_COUNT,
-    COLOR_BYTE_DEPTH,
     GIF_DISPOSAL_MODE_TRANSPARENT,
     GIF_DISPOSAL_MODE_SOLID,
     GIF_LOOP_MODE,
-    GIF_FORMAT_HINT,
-    GIF_PLUGIN,
     FULL_ALPHA,
+    GIF_MAX_PALETTE_SIZE,
     ANIMATION_FPS,
-    SPACE,
-    generate_ascii_color_ramp,
-    RESOURCE_LETTER_HEIGHT,
+    get_ascii_color_ramp,
     DOWNSCALE_SAMPLE_MODE,
-    RESOURCE_LETTER_WIDTH,
     DEFAULT_PIXEL_PER_CHARACTERS,
     COLOR_PALETTE,
+    COLOR_BYTE_DEPTH,
+    OUTPUT_FORMAT_GIF,
 )
-from .animated_letter import AnimatedLetter
-from .rect import Rect
+from .glyph_tiles import GlyphTiles
 from .color import Color
+from .gif_writer import GifWriter
+from .frame_writers import open_frame_writer
+from .result_cache import ResultCache
+from .atomic_write import open_for_replace
+from .instrumentation import measure, count
+from .video_frames import iter_video_frames
 from io import BytesIO
-import imageio
+
+# Glyph indices, animation states and colors (or None) of every cell of a frame.
+Cells = tuple[np.ndarray, np.ndarray, np.ndarray | None]
 
 
 class AnimatedAsciiArt:
@@ -34,136 +39,447 @@ class AnimatedAsciiArt:
         image: str | BinaryIO | Image.Image,
         pixels_per_character: int = DEFAULT_PIXEL_PER_CHARACTERS,
         greyscale: bool = False,
-        color_ramp: str = generate_ascii_color_ramp(),
+        color_ramp: str | None = None,
         background_color: Color = TRANSPARENT_COLOR,
+        color_palette: list[Color] | None = None,
+        max_frames: int | None = None,
+        target_fps: float | None = None,
+        max_input_frames: int | None = None,
+        max_input_pixels: int | None = None,
+        seed: int | None = None,
+        frame_stride: int = 1,
+        start_time: float = 0.0,
+        end_time: float | None = None,
     ) -> None:
+        """
+        In color mode every character is drawn in the color of its pixel,
+        unless a color palette is given: then the closest palette color
+        is used, which is faster.
+
+        Input frames are decoded while rendering. Inputs pillow can not open
+        are read as video with imageio, one frame at a time. Animated input
+        can be cut to the frames between start_time and end_time (in seconds),
+        thinned out to every frame_stride-th frame, resampled to a lower fps
+        and cut off after max_frames frames.
+        Inputs with more than max_input_frames frames or max_input_pixels
+        pixels (over all frames) are rejected with a ValueError. Videos do not
+        tell their size up front, they are rejected once decoding gets there.
+
+        With a seed every rendering of the same input animates the same way.
+        """
+        if color_ramp is None:
+            color_ramp = get_ascii_color_ramp()
+
         assert len(color_ramp) > 0
         assert pixels_per_character > 0
+        assert max_frames is None or max_frames > 0
+        assert target_fps is None or target_fps > 0
+        assert frame_stride > 0
+        assert start_time >= 0 and (end_time is None or end_time > start_time)
 
         self.__pixels_per_character = pixels_per_character
         self.__greyscale = greyscale
         self.__color_ramp = color_ramp
         self.__background_color = background_color
+        self.__color_palette = color_palette
+        self.__palette, self.__color_palette_indices = self.__make_palette()
 
-        self.__images = []
-        self.__durations = []
+        self.__max_frames = max_frames
+        self.__target_fps = target_fps
+        self.__seed = seed
+        self.__frame_stride = frame_stride
+        self.__start_time = start_time
+        self.__end_time = end_time
+        self.__max_input_frames = max_input_frames
+        self.__max_input_pixels = max_input_pixels
 
+        self.__source: Image.Image | None = None
+        self.__video: str | BinaryIO | None = None
         if type(image) == Image.Image:
-            loaded_image = image
-        else:
-            loaded_image = Image.open(image)  # type: ignore
-
-        # Check if input is iterable like a gif or similar...
-        if hasattr(loaded_image, "n_frames") and loaded_image.n_frames > 1:
-            for n in range(loaded_image.n_frames):
-                loaded_image.seek(n)
-                self.__images.append(self.__load_image(loaded_image))
-                self.__durations.append(
-                    loaded_image.info.get("duration", 1000 * 1 / ANIMATION_FPS)
-                )
+            self.__source = image
         else:
-            self.__images.extend(
-                [self.__load_image(loaded_image)] * ANIMATION_FRAME_COUNT
+            try:
+                self.__source = Image.open(image)  # type: ignore
+            except UnidentifiedImageError:
+                if hasattr(image, "seek"):
+                    image.seek(0)  # type: ignore
+                self.__video = image  # type: ignore
+                return
+
+        # Reject inputs that are too expensive before decoding anything.
+        frame_count = getattr(self.__source, "n_frames", 1)
+        self.__check_input_size(
+            frame_count, self.__source.width * self.__source.height * frame_count
+        )
+
+    def __check_input_size(self, frame_count: int, pixel_count: int) -> None:
+        if self.__max_input_frames is not None and (
+            frame_count > self.__max_input_frames
+        ):
+            raise ValueError(
+                f"Input has {frame_count} frames, "
+                f"at most {self.__max_input_frames} are allowed"
             )
-            self.__durations = [1000 * 1 / ANIMATION_FPS] * ANIMATION_FRAME_COUNT
-
-    def __load_image(self, image: Image.Image) -> np.ndarray:
-        image = image.convert("RGBA")
-        return np.array(
-            image.resize(
-                (
-                    math.floor(image.width / self.__pixels_per_character),
-                    math.floor(image.height / self.__pixels_per_character),
-                ),
-                resample=DOWNSCALE_SAMPLE_MODE,
+        if self.__max_input_pixels is not None and (
+            pixel_count > self.__max_input_pixels
+        ):
+            raise ValueError(
+                f"Input has {pixel_count} pixels, "
+                f"at most {self.__max_input_pixels} are allowed"
             )
-        )
 
-    def __pixel_to_ascii(self, pixel: np.ndarray) -> str:
-        # wikipedia says this is how to convert color to greyscale...
-        greyscale = (0.21 * pixel[0] + 0.72 * pixel[1] + 0.07 * pixel[2]) * (
-            0 if pixel[3] == 0 else 1
+    @staticmethod
+    def get_cache_key(
+        image_data: bytes,
+        pixels_per_character: int = DEFAULT_PIXEL_PER_CHARACTERS,
+        greyscale: bool = False,
+        color_ramp: str | None = None,
+        background_color: Color = TRANSPARENT_COLOR,
+        color_palette: list[Color] | None = None,
+        max_frames: int | None = None,
+        target_fps: float | None = None,
+        seed: int | None = None,
+        frame_stride: int = 1,
+        start_time: float = 0.0,
+        end_time: float | None = None,
+        output_format: str = OUTPUT_FORMAT_GIF,
+    ) -> str:
+        """
+        ResultCache key of the output for an encoded input image and these
+        arguments. The input limits are left out, they do not change the output.
+        """
+        return ResultCache.make_key(
+            "ascii",
+            hashlib.sha256(image_data).hexdigest(),
+            pixels_per_character,
+            greyscale,
+            get_ascii_color_ramp() if color_ramp is None else color_ramp,
+            background_color,
+            color_palette,
+            max_frames,
+            target_fps,
+            seed,
+            frame_stride,
+            start_time,
+            end_time,
+            output_format,
+            ANIMATION_FRAME_COUNT,
+            ANIMATION_FPS,
         )
-        return self.__color_ramp[
-            math.ceil((len(self.__color_ramp) - 1) * greyscale / 255)
-        ]
 
-    def write_raw_frames(self) -> list[np.ndarray]:
-        # Make all letters we need only once in default position
-        # with default color.
-        available_letters = {
-            letter: AnimatedLetter(
-                letter,
-                Rect(0, 0, RESOURCE_LETTER_WIDTH, RESOURCE_LETTER_HEIGHT),
-                COLOR_PALETTE["grey"],
-                self.__background_color,
+    def __iter_source_images(self) -> Iterator[tuple[np.ndarray, float]]:
+        """
+        Decode input frames one at a time, yields (image, duration in ms) of
+        every frame_stride-th frame in the time window. Skipped frames extend
+        the duration of the frame before them.
+        """
+        if self.__video is not None:
+            frames = self.__iter_video_frames()
+        elif getattr(self.__source, "n_frames", 1) > 1:
+            frames = self.__iter_animation_frames()
+        else:
+            assert self.__source is not None
+            image = self.__load_image(self.__source)
+            for _ in range(ANIMATION_FRAME_COUNT):
+                yield image, 1000 * 1 / ANIMATION_FPS
+            return
+
+        start = 1000 * self.__start_time
+        end = None if self.__end_time is None else 1000 * self.__end_time
+        elapsed = 0.0
+        kept: tuple[np.ndarray, float] | None = None
+        index = 0
+        for frame, duration in frames:
+            frame_start = elapsed
+            elapsed += duration
+            if frame_start < start:
+                continue
+            if end is not None and frame_start >= end:
+                break
+
+            if kept is None or index % self.__frame_stride == 0:
+                if kept is not None:
+                    yield kept
+                # Load right away, the source may reuse the frame for the next one.
+                kept = (self.__load_image(frame), duration)
+            else:
+                kept = (kept[0], kept[1] + duration)
+            index += 1
+
+        if kept is None:
+            raise ValueError("Input has no frames in the time window")
+        yield kept
+
+    def __iter_animation_frames(self) -> Iterator[tuple[Image.Image, float]]:
+        assert self.__source is not None
+        for n in range(self.__source.n_frames):
+            self.__source.seek(n)
+            yield (
+                self.__source,
+                self.__source.info.get("duration", 1000 * 1 / ANIMATION_FPS),
             )
-            for letter in self.__color_ramp
-            if letter != SPACE
-        }
-
-        # Manually keep track of animation states.
-        # Start each letter in a random state.
-        animation_states = np.random.randint(3, size=self.__images[0].shape[0:2])
-
-        frames = []
-        for image in self.__images:
-            # Convert input image to string array that holds the ascii chars to render.
-            ascii_image = np.apply_along_axis(self.__pixel_to_ascii, 2, image)
-
-            # Not a typo: We make the letter boxes square so we dont
-            # change the image aspect ratio.
-            result_width = ascii_image.shape[0] * (RESOURCE_LETTER_HEIGHT)
-            result_height = ascii_image.shape[1] * RESOURCE_LETTER_HEIGHT
-
-            screen = np.full(
-                (result_width, result_height, COLOR_BYTE_DEPTH),
-                self.__background_color,
-                dtype=np.uint8,
+
+    def __iter_video_frames(self) -> Iterator[tuple[np.ndarray, float]]:
+        assert self.__video is not None
+        frame_count = 0
+        pixel_count = 0
+        for frame, duration in iter_video_frames(self.__video):
+            frame_count += 1
+            pixel_count += frame.shape[0] * frame.shape[1]
+            self.__check_input_size(frame_count, pixel_count)
+            yield frame, duration
+
+    def __iter_images(self) -> Iterator[tuple[np.ndarray, float]]:
+        """
+        Input frames after resampling to the target fps and applying the frame limit.
+        Dropped frames extend the duration of the frame before them,
+        so the total duration stays the same.
+        """
+        min_duration = 0 if self.__target_fps is None else 1000 / self.__target_fps
+        frame_count = 0
+        elapsed = 0.0
+        next_frame_time = 0.0
+        kept: tuple[np.ndarray, float] | None = None
+
+        for image, duration in self.__iter_source_images():
+            if kept is not None and elapsed < next_frame_time:
+                kept = (kept[0], kept[1] + duration)
+            else:
+                if kept is not None:
+                    yield kept
+                    frame_count += 1
+                    if self.__max_frames is not None and frame_count >= self.__max_frames:
+                        return
+                kept = (image, duration)
+                next_frame_time = elapsed + min_duration
+            elapsed += duration
+
+        if kept is not None:
+            yield kept
+
+    def __load_image(self, image: Image.Image | np.ndarray) -> np.ndarray:
+        with measure("ascii_decode"):
+            if isinstance(image, np.ndarray):
+                image = Image.fromarray(image)
+            image = image.convert("RGBA")
+            return np.array(
+                image.resize(
+                    (
+                        math.floor(image.width / self.__pixels_per_character),
+                        math.floor(image.height / self.__pixels_per_character),
+                    ),
+                    resample=DOWNSCALE_SAMPLE_MODE,
+                )
             )
 
-            # Go over ascii image convert string to letter objects.
-            for x in range(ascii_image.shape[0]):
-                for y in range(ascii_image.shape[1]):
-                    if ascii_image[x][y] == SPACE:
-                        continue
+    def __image_to_ascii(self, image: np.ndarray) -> np.ndarray:
+        """
+        Map every pixel to the index of its character in the color ramp.
+        """
+        # wikipedia says this is how to convert color to greyscale...
+        greyscale = (
+            0.21 * image[:, :, 0] + 0.72 * image[:, :, 1] + 0.07 * image[:, :, 2]
+        ) * (image[:, :, 3] != 0)
+        return np.ceil((len(self.__color_ramp) - 1) * greyscale / 255).astype(np.intp)
 
-                    letter = available_letters[ascii_image[x][y]]
+    def iter_frames(self) -> Iterator[np.ndarray]:
+        for screen, _ in self.__iter_screens(indexed=False):
+            yield screen
 
-                    # Again not a typo. Make letters square.
-                    letter.location = (
-                        y * RESOURCE_LETTER_HEIGHT,
-                        x * RESOURCE_LETTER_HEIGHT,
-                    )
+    def iter_indexed_frames(self) -> Iterator[np.ndarray]:
+        """
+        Like iter_frames, but frames are 2D arrays of indices into palette.
+        Only available if there is a palette.
+        """
+        assert self.__palette is not None, "Full color output has no palette"
+        for screen, _ in self.__iter_screens(indexed=True):
+            yield screen
 
-                    if not self.__greyscale:
-                        letter.foreground_color = image[x, y]
+    @property
+    def palette(self) -> list[Color] | None:
+        """
+        Global palette of the output. Greyscale output only uses the background
+        and grey, with a color palette only the background and palette colors
+        are used. In full color mode there is no palette.
+        """
+        return self.__palette
 
-                    letter.draw(screen)
-                    animation_states[x][y] = letter.advance_animation(
-                        animation_states[x][y]
+    def __make_palette(self) -> tuple[list[Color] | None, list[int]]:
+        """
+        Returns the output palette and the output palette index of every
+        color palette color.
+        """
+        palette = [self.__background_color]
+        if self.__greyscale:
+            return palette + [COLOR_PALETTE["grey"]], []
+        if self.__color_palette is None:
+            return None, []
+
+        indices = []
+        for color in self.__color_palette:
+            # Gif has only one transparent color, do not add another.
+            if color.a == 0 and self.__background_color.a == 0:
+                indices.append(0)
+                continue
+            if color not in palette:
+                palette.append(color)
+            indices.append(palette.index(color))
+
+        return (palette if len(palette) <= GIF_MAX_PALETTE_SIZE else None), indices
+
+    def __make_glyph_tiles(self, indexed: bool) -> tuple[GlyphTiles, GlyphTiles]:
+        """
+        Returns the plain tiles, which drive the animation, and the tiles
+        frames are composed from.
+        """
+        # Render every letter we need only once in every animation frame.
+        with measure("ascii_glyph_tiles"):
+            tiles = GlyphTiles.from_characters(
+                self.__color_ramp, COLOR_PALETTE["grey"], self.__background_color
+            )
+            if self.__greyscale:
+                return tiles, tiles.to_indices(1, 0) if indexed else tiles
+            if self.__color_palette is None:
+                return tiles, tiles
+
+            tinted_tiles = tiles.tint(self.__color_palette)
+            if indexed:
+                tinted_tiles = tinted_tiles.to_indices(
+                    np.repeat(self.__color_palette_indices, tiles.glyph_count), 0
+                )
+            return tiles, tinted_tiles
+
+    def __iter_cells(self, tiles: GlyphTiles) -> Iterator[tuple[Cells, float]]:
+        """
+        What to draw in every cell of every frame. Only this part carries
+        state from frame to frame, composing the frames is independent.
+        """
+        rng = np.random.default_rng(self.__seed)
+        animation_states = None
+        for image, duration in self.__iter_images():
+            # Manually keep track of animation states.
+            # Start each letter in a random state.
+            if animation_states is None:
+                animation_states = rng.integers(3, size=image.shape[0:2])
+
+            # Convert input image to index array that holds the ascii chars to render.
+            with measure("ascii_map"):
+                ascii_image = self.__image_to_ascii(image)
+
+            glyphs, colors = ascii_image, None
+            if self.__greyscale:
+                pass
+            elif self.__color_palette is not None:
+                with measure("ascii_quantize"):
+                    glyphs = (
+                        self.__quantize_colors(image) * tiles.glyph_count + ascii_image
                     )
+            else:
+                colors = image
+
+            count("ascii_frames_total")
+            count("ascii_cells_total", ascii_image.size)
+
+            yield (glyphs, animation_states, colors), duration
+            animation_states = tiles.advance_animation(ascii_image, animation_states, rng)
+
+    def __iter_screens(self, indexed: bool) -> Iterator[tuple[np.ndarray, float]]:
+        tiles, compose_tiles = self.__make_glyph_tiles(indexed)
+        for (glyphs, animation_states, colors), duration in self.__iter_cells(tiles):
+            with measure("ascii_composite"):
+                screen = compose_tiles.compose(glyphs, animation_states, colors)
+            count("ascii_frame_bytes_total", screen.nbytes)
+            yield screen, duration
 
-            frames.append(screen)
+    def write_raw_frames(self) -> list[np.ndarray]:
+        return list(self.render_frames())
+
+    def render_frames(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        All frames as one contiguous (frames, height, width, rgba) uint8 array.
+        They are written to out if given, e.g. a reused buffer. How many frames
+        there are is only known after decoding the input, out must have room
+        for at least as many and the filled part of it is returned.
+        """
+        tiles, compose_tiles = self.__make_glyph_tiles(indexed=False)
+        cells = [frame_cells for frame_cells, _ in self.__iter_cells(tiles)]
+        rows, columns = cells[0][0].shape
+        shape = (
+            len(cells),
+            rows * compose_tiles.cell_size,
+            columns * compose_tiles.cell_size,
+            COLOR_BYTE_DEPTH,
+        )
 
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        if out.shape[1:] != shape[1:] or len(out) < len(cells) or out.dtype != np.uint8:
+            raise ValueError(
+                f"Frames need a uint8 array of shape {shape}, "
+                f"got {out.dtype} {out.shape}"
+            )
+        if not out.flags.c_contiguous:
+            raise ValueError("Frames need a contiguous array")
+        frames = out[: len(cells)]
+
+        for frame, (glyphs, animation_states, colors) in zip(frames, cells):
+            with measure("ascii_composite"):
+                compose_tiles.compose(glyphs, animation_states, colors, out=frame)
+        count("ascii_frame_bytes_total", frames.nbytes)
         return frames
 
+    def __quantize_colors(self, image: np.ndarray) -> np.ndarray:
+        """
+        Index of the closest palette color for every pixel.
+        Fully transparent pixels map to the first transparent palette color if any.
+        """
+        assert self.__color_palette is not None
+        palette = np.array(self.__color_palette, dtype=np.int32)
+        distances = (
+            (image[:, :, None, :3].astype(np.int32) - palette[:, :3]) ** 2
+        ).sum(axis=3)
+        indices = distances.argmin(axis=2)
+
+        transparent = np.flatnonzero(palette[:, 3] == 0)
+        if len(transparent) > 0:
+            indices[image[:, :, 3] == 0] = transparent[0]
+
+        return indices
+
     def write_to_gif(self, filename: str) -> None:
-        with open(filename, "wb") as f:
-            f.write(self.write_to_buffer().getbuffer())
+        self.write_to_file(filename)
+
+    def write_to_file(
+        self, filename: str, output_format: str = OUTPUT_FORMAT_GIF
+    ) -> None:
+        """
+        Output formats are listed in OUTPUT_FORMATS. The file is only
+        replaced once the whole output was written.
+        """
+        with open_for_replace(filename) as f:
+            self.__write(f, output_format)
 
-    def write_to_buffer(self) -> BytesIO:
+    def write_to_buffer(self, output_format: str = OUTPUT_FORMAT_GIF) -> BytesIO:
         result = BytesIO()
-        imageio.v3.imwrite(
-            result,
-            self.write_raw_frames(),
-            extension=GIF_FORMAT_HINT,
-            plugin=GIF_PLUGIN,
-            duration=self.__durations,
+        self.__write(result, output_format)
+        result.seek(0)
+        return result
+
+    def __write(self, fp: BinaryIO, output_format: str) -> None:
+        if output_format != OUTPUT_FORMAT_GIF:
+            with open_frame_writer(fp, output_format, GIF_LOOP_MODE) as writer:
+                for frame, duration in self.__iter_screens(indexed=False):
+                    writer.write_frame(frame, duration)
+            return
+
+        # Write indices directly if possible, saves quantizing every frame.
+        with GifWriter(
+            fp,
             loop=GIF_LOOP_MODE,
             disposal=GIF_DISPOSAL_MODE_TRANSPARENT
             if self.__background_color.a != FULL_ALPHA
             else GIF_DISPOSAL_MODE_SOLID,
-        )
-        result.seek(0)
-        return result
+            palette=self.__palette,
+        ) as writer:
+            for frame, duration in self.__iter_screens(self.__palette is not None):
+                writer.write_frame(frame, duration)
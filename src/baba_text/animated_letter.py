@@ -1,4 +1,5 @@
 from .animated_object import AnimatedObject
+import random
 import urllib.parse
 from .rect import Rect
 from .color import Color
@@ -11,6 +12,7 @@ class AnimatedLetter(AnimatedObject):
         box: Rect,
         text_color: Color,
         background_color: Color,
+        rng: random.Random | None = None,
     ) -> None:
         try:
             super().__init__(
@@ -18,6 +20,7 @@ class AnimatedLetter(AnimatedObject):
                 box,
                 text_color,
                 background_color,
+                rng,
             )
         except FileNotFoundError:
             raise FileNotFoundError(f"Got illegal character: {letter}")
@@ -1,13 +1,9 @@
-from .constants import ASSETS_DIR, MASK_COLOR
-from glob import glob
-import os
 import random
 from .rect import Rect
 from .color import Color
 import numpy as np
-from PIL import Image
-from .constants import LETTER_SAMPLE_MODE
-from .masked_image import MaskedImage
+from .sprite_cache import SPRITE_CACHE
+from .instrumentation import measure
 
 
 class AnimatedObject:
@@ -17,22 +13,31 @@ class AnimatedObject:
         box: Rect,
         foreground_color: Color,
         background_color: Color,
+        rng: random.Random | None = None,
     ) -> None:
+        """
+        Animation frames are picked with rng, or the global random module
+        if there is none.
+        """
         self.__name = name
         self.__box = box
         self.__foreground_color = foreground_color
         self.__background_color = background_color
+        self.__randint = random.randint if rng is None else rng.randint
 
-        self.__sprites = self.__load_images()
+        self.__sprites = SPRITE_CACHE.get(self.__name, self.__box.size)
 
         if len(self.__sprites) == 0:
             raise FileNotFoundError(f"Did not find sprites for object: {name}")
 
+        # Sprites are recolored on the first draw, draw_indices only needs
+        # their masks. Word tiles are drawn that way and skip recoloring.
+        self.__recolored = False
         self.__current_animation_index = 0
 
     def advance_animation(self, override_index: int | None = None) -> int:
         offset = (
-            random.randint(1, len(self.__sprites) - 1) if len(self.__sprites) > 2 else 1
+            self.__randint(1, len(self.__sprites) - 1) if len(self.__sprites) > 2 else 1
         )
         self.__current_animation_index = (
             (
@@ -45,11 +50,42 @@ class AnimatedObject:
         return self.__current_animation_index
 
     def draw(self, surface: np.ndarray) -> None:
+        if not self.__recolored:
+            self.__recolor()
         # Careful: Numpy is column major (we need to flip x and y)
         surface[
             self.__box.top : self.__box.bottom, self.__box.left : self.__box.right
         ] = self.__sprites[self.__current_animation_index].image
 
+    def draw_indices(self, surface: np.ndarray, palette: dict[Color, int]) -> None:
+        """
+        Draw into a surface of palette indices instead of colors.
+        """
+        sprite = self.__sprites[self.__current_animation_index]
+        surface[
+            self.__box.top : self.__box.bottom, self.__box.left : self.__box.right
+        ] = np.where(
+            sprite.foreground_mask,
+            palette[self.__foreground_color],
+            palette[self.__background_color],
+        )
+
+    @property
+    def animation_frame_count(self) -> int:
+        return len(self.__sprites)
+
+    @property
+    def animation_index(self) -> int:
+        return self.__current_animation_index
+
+    @animation_index.setter
+    def animation_index(self, value: int) -> None:
+        self.__current_animation_index = value % len(self.__sprites)
+
+    @property
+    def foreground_mask(self) -> np.ndarray:
+        return self.__sprites[self.__current_animation_index].foreground_mask
+
     @property
     def location(self) -> tuple[int, int]:
         return (self.__box.left, self.__box.top)
@@ -65,36 +101,21 @@ class AnimatedObject:
 
     @background_color.setter
     def background_color(self, value: Color) -> None:
-        for sprite in self.__sprites:
-            sprite.set_background_color(value)
         self.__background_color = value
+        self.__recolored = False
 
     @property
     def foreground_color(self) -> Color:
-        return self.foreground_color
+        return self.__foreground_color
 
     @foreground_color.setter
     def foreground_color(self, value: Color) -> None:
-        for sprite in self.__sprites:
-            sprite.set_foreground_color(value)
         self.__foreground_color = value
-
-    def __load_images(self) -> list[MaskedImage]:
-        files = glob(os.path.join(ASSETS_DIR, f"{self.__name}_*.png"))
-        images = []
-
-        for file in files:
-            image = np.array(
-                Image.open(file)
-                .convert("RGBA")
-                .resize(self.__box.size, resample=LETTER_SAMPLE_MODE)
-            )
-            foreground_mask = np.any(image != MASK_COLOR, axis=2)
-            background_mask = np.all(image == MASK_COLOR, axis=2)
-            image[foreground_mask] = self.__foreground_color
-            image[background_mask] = self.__background_color
-            images.append(
-                MaskedImage(self.__name, file, image, foreground_mask, background_mask)
-            )
-
-        return images
+        self.__recolored = False
+
+    def __recolor(self) -> None:
+        with measure("sprite_recolor"):
+            for sprite in self.__sprites:
+                sprite.set_foreground_color(self.__foreground_color)
+                sprite.set_background_color(self.__background_color)
+        self.__recolored = True
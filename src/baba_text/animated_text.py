@@ -1,12 +1,17 @@
-from .animated_word import AnimatedWord
-import imageio
+from .word_tiles import WORD_TILE_CACHE, LABEL_BACKGROUND, LABEL_SPRITE, LABEL_TEXT
+from .text_layout import TextLayout
+from .gif_writer import GifWriter
+from .frame_writers import open_frame_writer
+from .result_cache import ResultCache
+from .atomic_write import open_for_replace
+from .instrumentation import measure, count
 from io import BytesIO
+import random
+from typing import BinaryIO, Iterator
 import numpy as np
-from .rect import Rect
 from .color import Color
 from .constants import (
     TRANSPARENT_COLOR,
-    SPRITE_SIZE,
     ANIMATION_FPS,
     ANIMATION_FRAME_COUNT,
     COLOR_PALETTE,
@@ -18,30 +23,81 @@ from .constants import (
     GIF_DISPOSAL_MODE_TRANSPARENT,
     GIF_DISPOSAL_MODE_SOLID,
     GIF_LOOP_MODE,
-    GIF_FORMAT_HINT,
-    GIF_PLUGIN,
     FULL_ALPHA,
+    WORD_TILE_VARIANTS,
+    OUTPUT_FORMAT_GIF,
 )
 
 
 class AnimatedText:
-    def __init__(self, text: str, background_color: Color = TRANSPARENT_COLOR) -> None:
+    def __init__(
+        self,
+        text: str,
+        background_color: Color = TRANSPARENT_COLOR,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Words are drawn from pre-rendered tiles (see WordTileCache), every word
+        picks one of the animated variants of its tile. Texts made with the same
+        seed pick the same variants and encode to the same bytes.
+        """
         assert text, "Text must not be empty"
         self.__tokens = AnimatedText.__tokenize_input_text(text)
         self.__background_color = background_color
 
-        word_layout = self.__generate_word_layout()
-        self.__size = (
-            max(w.right for w in word_layout),
-            max(w.bottom for w in word_layout),
-        )
+        with measure("text_layout"):
+            self.__layout = TextLayout.from_tokens(self.__tokens)
+        self.__size = self.__layout.size
 
-        self.__words = [
-            AnimatedWord(word, box, *self.__get_word_color(word), background_color)
-            for word, box in zip(
-                AnimatedText.__remove_control_sequences(self.__tokens), word_layout
-            )
-        ]
+        # Words are kept as arrays too: an index into tiles, which holds every
+        # distinct (word, variant) once, and the palette indices of the
+        # (background, sprite, text) colors its tile labels turn into.
+        words = AnimatedText.__remove_control_sequences(self.__tokens)
+        rng = random.Random(seed)
+        self.__tiles: list[np.ndarray] = []
+        tile_ids: dict[tuple[str, int], int] = {}
+        word_colors: dict[str, tuple[Color, Color]] = {}
+        # Output only ever uses the background and the word colors,
+        # so frames can be rendered as indices into one global palette.
+        palette = {background_color: 0}
+        self.__tile_ids = np.empty(len(words), dtype=np.intp)
+        self.__word_color_ids = np.zeros((len(words), 3), dtype=np.uint8)
+
+        for i, word in enumerate(words):
+            key = (word, rng.randrange(WORD_TILE_VARIANTS))
+            if key not in tile_ids:
+                tile_ids[key] = len(self.__tiles)
+                self.__tiles.append(WORD_TILE_CACHE.get(*key))
+            self.__tile_ids[i] = tile_ids[key]
+
+            if word not in word_colors:
+                word_colors[word] = self.__get_word_color(word)
+            for label, color in zip((LABEL_TEXT, LABEL_SPRITE), word_colors[word]):
+                self.__word_color_ids[i, label] = palette.setdefault(
+                    color, len(palette)
+                )
+
+        self.__palette = list(palette)
+
+    @staticmethod
+    def get_cache_key(
+        text: str,
+        background_color: Color = TRANSPARENT_COLOR,
+        seed: int | None = None,
+        output_format: str = OUTPUT_FORMAT_GIF,
+    ) -> str:
+        """
+        ResultCache key of the output for these arguments.
+        """
+        return ResultCache.make_key(
+            "text",
+            text,
+            background_color,
+            seed,
+            output_format,
+            ANIMATION_FRAME_COUNT,
+            ANIMATION_FPS,
+        )
 
     @staticmethod
     def __remove_control_sequences(tokens: list[str]) -> list[str]:
@@ -58,63 +114,136 @@ class AnimatedText:
         # Ensure every word is separated by exactly one space
         return list(filter(lambda x: len(x) > 0, result.split(SPACE)))
 
-    def write_raw_frames(self) -> list[np.ndarray]:
-        frames = []
-
-        for _ in range(ANIMATION_FRAME_COUNT):
-            # Careful: Numpy is column major (we need to flip x and y)
-            screen = np.full(
-                (self.__size[1], self.__size[0], COLOR_BYTE_DEPTH),
-                self.__background_color,
-                dtype=np.uint8,
+    @property
+    def frames_shape(self) -> tuple[int, int, int, int]:
+        """
+        Shape of render_frames: (frames, height, width, rgba).
+        """
+        return (ANIMATION_FRAME_COUNT, self.__size[1], self.__size[0], COLOR_BYTE_DEPTH)
+
+    def render_frames(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        All frames as one contiguous uint8 array of frames_shape. They are
+        written to out if given, e.g. a reused buffer or one in shared memory,
+        then rendering allocates nothing that grows with the text.
+        """
+        if out is None:
+            out = np.empty(self.frames_shape, dtype=np.uint8)
+        if out.shape != self.frames_shape or out.dtype != np.uint8:
+            raise ValueError(
+                f"Frames need a uint8 array of shape {self.frames_shape}, "
+                f"got {out.dtype} {out.shape}"
             )
-            for word in self.__words:
-                word.draw(screen)
-                word.advance_animation()
+        if not out.flags.c_contiguous:
+            raise ValueError("Frames need a contiguous array")
+        color_lookups = self.__get_color_lookups()
+        for frame, screen in enumerate(out):
+            self.__compose(frame, color_lookups, AnimatedText.__as_pixels(screen))
+        return out
+
+    def iter_frames(self) -> Iterator[np.ndarray]:
+        color_lookups = self.__get_color_lookups()
+        for frame in range(ANIMATION_FRAME_COUNT):
+            screen = np.empty(self.frames_shape[1:], dtype=np.uint8)
+            self.__compose(frame, color_lookups, AnimatedText.__as_pixels(screen))
+            yield screen
+
+    def iter_indexed_frames(self) -> Iterator[np.ndarray]:
+        """
+        Like iter_frames, but frames are 2D arrays of indices into palette.
+        """
+        for frame in range(ANIMATION_FRAME_COUNT):
+            screen = np.empty(self.frames_shape[1:3], dtype=np.uint8)
+            self.__compose(frame, self.__word_color_ids, screen)
+            yield screen
+
+    def __get_color_lookups(self) -> np.ndarray:
+        """
+        Per word (background, sprite, text) colors, as one uint32 per rgba pixel.
+        """
+        palette = np.array(self.__palette, dtype=np.uint8).view(np.uint32)[:, 0]
+        return palette[self.__word_color_ids]
+
+    @staticmethod
+    def __as_pixels(screen: np.ndarray) -> np.ndarray:
+        """
+        2D uint32 view of an rgba screen. Filling and copying whole pixels
+        is a lot faster than broadcasting 4 separate bytes.
+        """
+        return screen.view(np.uint32)[..., 0]
+
+    def __compose(self, frame: int, lookups: np.ndarray, screen: np.ndarray) -> None:
+        """
+        Draw a frame into a 2D screen, turning the tile labels of word i
+        into values with lookups[i].
+        """
+        size = self.__layout.cell_size
+        with measure("text_composite"):
+            screen[...] = lookups[0, LABEL_BACKGROUND]
+            for left, top, tile_id, lookup in zip(
+                self.__layout.lefts.tolist(),
+                self.__layout.tops.tolist(),
+                self.__tile_ids.tolist(),
+                lookups,
+            ):
+                # Take writes into the screen directly, without temporary tiles.
+                np.take(
+                    lookup,
+                    self.__tiles[tile_id][frame],
+                    out=screen[top : top + size, left : left + size],
+                    mode="clip",
+                )
 
-            frames.append(screen)
+        AnimatedText.__count_frame(screen)
 
-        return frames
+    @staticmethod
+    def __count_frame(screen: np.ndarray) -> None:
+        count("text_frames_total")
+        count("text_frame_bytes_total", screen.nbytes)
+
+    @property
+    def palette(self) -> list[Color]:
+        return self.__palette
+
+    def write_raw_frames(self) -> list[np.ndarray]:
+        return list(self.render_frames())
 
     def write_to_gif(self, filename: str) -> None:
-        with open(filename, "wb") as f:
-            f.write(self.write_to_buffer().getbuffer())
+        self.write_to_file(filename)
 
-    def write_to_buffer(self) -> BytesIO:
+    def write_to_file(
+        self, filename: str, output_format: str = OUTPUT_FORMAT_GIF
+    ) -> None:
+        """
+        Output formats are listed in OUTPUT_FORMATS. The file is only
+        replaced once the whole output was written.
+        """
+        with open_for_replace(filename) as f:
+            self.__write(f, output_format)
+
+    def write_to_buffer(self, output_format: str = OUTPUT_FORMAT_GIF) -> BytesIO:
         result = BytesIO()
-        imageio.v3.imwrite(
-            result,
-            self.write_raw_frames(),
-            extension=GIF_FORMAT_HINT,
-            plugin=GIF_PLUGIN,
-            duration=(1000 * 1 / ANIMATION_FPS),
-            loop=GIF_LOOP_MODE,
-            disposal=GIF_DISPOSAL_MODE_TRANSPARENT
-            if self.__background_color.a != FULL_ALPHA
-            else GIF_DISPOSAL_MODE_SOLID,
-        )
+        self.__write(result, output_format)
         result.seek(0)
         return result
 
-    def __generate_word_layout(self) -> list[Rect]:
-        result = []
-        x = 0
-        y = 0
-        for token in self.__tokens:
-            if token == NEWLINE:
-                y += 1
-                x = 0
-                continue
-            elif token == TAB:
-                x += 1
-                continue
-
-            result.append(
-                Rect(x * SPRITE_SIZE, y * SPRITE_SIZE, SPRITE_SIZE, SPRITE_SIZE)
-            )
-            x += 1
+    def __write(self, fp: BinaryIO, output_format: str) -> None:
+        if output_format != OUTPUT_FORMAT_GIF:
+            with open_frame_writer(fp, output_format, GIF_LOOP_MODE) as writer:
+                for frame in self.iter_frames():
+                    writer.write_frame(frame, 1000 * 1 / ANIMATION_FPS)
+            return
 
-        return result
+        with GifWriter(
+            fp,
+            loop=GIF_LOOP_MODE,
+            disposal=GIF_DISPOSAL_MODE_TRANSPARENT
+            if self.__background_color.a != FULL_ALPHA
+            else GIF_DISPOSAL_MODE_SOLID,
+            palette=self.__palette,
+        ) as writer:
+            for frame in self.iter_indexed_frames():
+                writer.write_frame(frame, 1000 * 1 / ANIMATION_FPS)
 
     @staticmethod
     def __get_word_hash(word):
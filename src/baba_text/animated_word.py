@@ -6,9 +6,11 @@ from .constants import (
     BACKGROUND_SPRITE_FILENAME,
 )
 from .animated_object import AnimatedObject
+from .instrumentation import measure
 from .rect import Rect
 from .color import Color
 import numpy as np
+import random
 
 
 class AnimatedWord(AnimatedObject):
@@ -19,16 +21,19 @@ class AnimatedWord(AnimatedObject):
         text_color: Color,
         sprite_color: Color,
         background_color: Color,
+        rng: random.Random | None = None,
     ) -> None:
         self.__text = text
         assert self.__text
         self.__box = box
+        with measure("word_layout"):
+            letter_boxes = self.__fit_text_to_this_box()
         self.__letters = [
-            AnimatedLetter(c, b, text_color, sprite_color)
-            for c, b in zip(text, self.__fit_text_to_this_box())
+            AnimatedLetter(c, b, text_color, sprite_color, rng)
+            for c, b in zip(text, letter_boxes)
         ]
         super().__init__(
-            BACKGROUND_SPRITE_FILENAME, box, sprite_color, background_color
+            BACKGROUND_SPRITE_FILENAME, box, sprite_color, background_color, rng
         )
 
     def advance_animation(self):
@@ -41,26 +46,36 @@ class AnimatedWord(AnimatedObject):
         for letter in self.__letters:
             letter.draw(surface)
 
-    def __fit_text_to_this_box(self) -> list[Rect]:
-        row_count = int(floor(sqrt(len(self.__text))))
-        per_row = int(ceil(len(self.__text) / row_count))
+    def draw_indices(self, surface: np.ndarray, palette: dict[Color, int]) -> None:
+        super().draw_indices(surface, palette)
+        for letter in self.__letters:
+            letter.draw_indices(surface, palette)
+
+    @staticmethod
+    def get_letter_layout(
+        letter_count: int, box_width: float, box_height: float
+    ) -> tuple[int, int, float, float]:
+        """
+        Returns row count, letters per row, letter width and letter height
+        for a word of this many letters in a box of this size.
+        """
+        row_count = int(floor(sqrt(letter_count)))
+        per_row = int(ceil(letter_count / row_count))
 
         # Magic scale function to make it look more similar
         # to baba text with low letter count...
-        if len(self.__text) == 1:
+        if letter_count == 1:
             scale = 1.0
-        elif len(self.__text) == 2:
+        elif letter_count == 2:
             scale = 1.0
-        elif 3 <= len(self.__text) <= 4:
+        elif 3 <= letter_count <= 4:
             scale = 1.0
         else:
             scale = 0.75
 
-        want_letter_height = min(
-            (self.__box.height / row_count) * scale, MAX_LETTER_HEIGHT
-        )
+        want_letter_height = min((box_height / row_count) * scale, MAX_LETTER_HEIGHT)
         want_letter_width = min(
-            (self.__box.width / per_row) * scale,
+            (box_width / per_row) * scale,
             MAX_LETTER_HEIGHT * LETTER_WIDTH_TO_HEIGHT_RATIO,
         )
 
@@ -71,6 +86,13 @@ class AnimatedWord(AnimatedObject):
             letter_height = want_letter_height
             letter_width = letter_height * LETTER_WIDTH_TO_HEIGHT_RATIO
 
+        return row_count, per_row, letter_width, letter_height
+
+    def __fit_text_to_this_box(self) -> list[Rect]:
+        row_count, per_row, letter_width, letter_height = AnimatedWord.get_letter_layout(
+            len(self.__text), self.__box.width, self.__box.height
+        )
+
         offset_x = (self.__box.width - per_row * (letter_width)) / 2
         offset_y = (self.__box.height - row_count * (letter_height)) / 2
 
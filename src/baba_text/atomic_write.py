@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+import os
+import uuid
+
+
+@contextmanager
+def open_for_replace(path: str) -> Iterator[BinaryIO]:
+    """
+    Open a temporary file next to path for writing, which replaces path once
+    the block finishes. If it raises, the temporary file is removed and path
+    is left as it was, so readers never see half written outputs.
+    """
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporary, "xb") as f:
+            yield f
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
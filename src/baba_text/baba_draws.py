@@ -1,6 +1,14 @@
 from baba_text.animated_ascii_art import AnimatedAsciiArt
 import argparse
-from baba_text.constants import COLOR_PALETTE, TRANSPARENT_COLOR
+import sys
+from baba_text.profiling import add_profiling_arguments, run_profiled
+from baba_text.constants import (
+    COLOR_PALETTE,
+    TRANSPARENT_COLOR,
+    ASCII_COLOR_PALETTE,
+    OUTPUT_FORMAT_GIF,
+    OUTPUT_FORMATS,
+)
 
 def main_cli():
     parser = argparse.ArgumentParser(
@@ -33,16 +41,68 @@ def main_cli():
         default=False,
         help="Whether to render in color or greyscale",
     )
+    parser.add_argument(
+        "-p",
+        "--palette",
+        action="store_true",
+        default=False,
+        help="In color mode snap colors to the baba color palette, renders faster",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=list(OUTPUT_FORMATS),
+        default=OUTPUT_FORMAT_GIF,
+        help="Output format, webp is smaller and mostly faster to encode than gif, "
+        "sprite-sheet puts all frames into one png",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the letter animation, the same seed gives the same gif",
+    )
+    parser.add_argument(
+        "--frame-stride",
+        type=int,
+        default=1,
+        help="Only render every n-th frame of animated input",
+    )
+    parser.add_argument(
+        "--start",
+        type=float,
+        default=0.0,
+        help="Skip animated input before this many seconds",
+    )
+    parser.add_argument(
+        "--end",
+        type=float,
+        default=None,
+        help="Stop reading animated input after this many seconds",
+    )
+    add_profiling_arguments(parser)
     args = parser.parse_args()
 
-    AnimatedAsciiArt(
+    render = lambda: AnimatedAsciiArt(
         args.input_file,
         pixels_per_character=args.pixels_per_character,
         greyscale=not args.color,
         background_color=TRANSPARENT_COLOR
         if not args.solid
         else COLOR_PALETTE["black"],
-    ).write_to_gif(args.output_file)
+        color_palette=ASCII_COLOR_PALETTE if args.palette else None,
+        seed=args.seed,
+        frame_stride=args.frame_stride,
+        start_time=args.start,
+        end_time=args.end,
+    ).write_to_file(args.output_file, args.format)
+
+    if args.profile is None and args.repeat == 1:
+        render()
+        return
+
+    report = run_profiled(render, args.repeat, args.profile)
+    print(report.format(), file=sys.stderr)
 
 if __name__ == '__main__':
     main_cli()
\ No newline at end of file
@@ -1,6 +1,15 @@
 from baba_text.animated_text import AnimatedText
 import argparse
-from baba_text.constants import COLOR_PALETTE, TRANSPARENT_COLOR
+import os
+import sys
+from baba_text.profiling import add_profiling_arguments, run_profiled
+from baba_text.text_batch import TextJobResult, parse_text_jobs, run_text_jobs
+from baba_text.constants import (
+    COLOR_PALETTE,
+    TRANSPARENT_COLOR,
+    OUTPUT_FORMAT_GIF,
+    OUTPUT_FORMATS,
+)
 
 def main_cli():
     parser = argparse.ArgumentParser(
@@ -9,8 +18,10 @@ def main_cli():
         "Use uppercase letter to denote adjectives."
         "Use \\n and \\t for text layout",
     )
-    parser.add_argument("input_text", help="The input text to render")
-    parser.add_argument("output_file", help="Where to write the output gif to")
+    parser.add_argument("input_text", nargs="?", help="The input text to render")
+    parser.add_argument(
+        "output_file", nargs="?", help="Where to write the output gif to"
+    )
     parser.add_argument(
         "-s",
         "--solid",
@@ -18,14 +29,116 @@ def main_cli():
         default=False,
         help="Make background solid instead of transparent",
     )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=list(OUTPUT_FORMATS),
+        default=OUTPUT_FORMAT_GIF,
+        help="Output format, webp is smaller and mostly faster to encode than gif, "
+        "sprite-sheet puts all frames into one png",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the letter animation, the same seed gives the same gif",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        metavar="FILE",
+        default=None,
+        help="Render every line of FILE (- for stdin) instead of input_text. Lines "
+        'are texts or JSON like {"text": "baba is You", "output": "baba.gif", '
+        '"solid": true, "seed": 1}',
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        default=".",
+        help="Where batch jobs write their gifs to, unless they give a full path",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Render batches with this many worker processes",
+    )
+    add_profiling_arguments(parser)
     args = parser.parse_args()
 
-    AnimatedText(
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.batch is not None:
+        if args.input_text is not None:
+            parser.error("Pass either input_text and output_file or --batch")
+        if args.profile is not None or args.repeat != 1:
+            parser.error("--profile and --repeat do not work with --batch")
+        sys.exit(
+            run_batch(
+                args.batch,
+                args.output_dir,
+                args.solid,
+                args.seed,
+                args.format,
+                args.jobs,
+            )
+        )
+    if args.output_file is None:
+        parser.error("input_text and output_file are required without --batch")
+
+    render = lambda: AnimatedText(
         args.input_text.replace("\\n", "\n").replace("\\t", "\t"),
         background_color=TRANSPARENT_COLOR
         if not args.solid
         else COLOR_PALETTE["black"],
-    ).write_to_gif(args.output_file)
+        seed=args.seed,
+    ).write_to_file(args.output_file, args.format)
+
+    if args.profile is None and args.repeat == 1:
+        render()
+        return
+
+    report = run_profiled(render, args.repeat, args.profile)
+    print(report.format(), file=sys.stderr)
+
+def run_batch(
+    batch_file: str,
+    output_dir: str,
+    solid: bool,
+    seed: int | None,
+    output_format: str,
+    jobs: int,
+) -> int:
+    # Malformed lines fail on their own like jobs that do not render.
+    parse_errors: list[TextJobResult] = []
+    if batch_file == "-":
+        text_jobs = parse_text_jobs(
+            sys.stdin, output_dir, solid, seed, output_format, parse_errors
+        )
+    else:
+        with open(batch_file) as f:
+            text_jobs = parse_text_jobs(
+                f, output_dir, solid, seed, output_format, parse_errors
+            )
+    os.makedirs(output_dir, exist_ok=True)
+
+    done = 0
+    total = len(parse_errors) + len(text_jobs)
+
+    def report(result: TextJobResult) -> None:
+        nonlocal done
+        done += 1
+        status = "ok" if result.ok else f"failed: {result.error}"
+        print(f"[{done}/{total}] {result.job.output_file} {status}", file=sys.stderr)
+
+    for result in parse_errors:
+        report(result)
+    results = parse_errors + run_text_jobs(text_jobs, jobs, report)
+    failed = sum(not result.ok for result in results)
+    print(f"Rendered {len(results) - failed} of {len(results)} texts", file=sys.stderr)
+    return 1 if failed else 0
 
 if __name__ == '__main__':
     main_cli()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import argparse
+import os
+from baba_text.constants import (
+    ASSETS_DIR,
+    BACKGROUND_SPRITE_FILENAME,
+    COLOR_RAMP_FILE,
+    SPRITE_ATLAS_FILE,
+    SPRITE_ATLAS_INDEX_FILE,
+    SPRITE_SIZE,
+    RESOURCE_LETTER_WIDTH,
+    RESOURCE_LETTER_HEIGHT,
+    ATLAS_MAX_WORD_LENGTH,
+    write_ascii_color_ramp,
+)
+from baba_text.animated_word import AnimatedWord
+from baba_text.sprite_atlas import SpriteAtlas
+
+
+def get_atlas_sizes() -> dict[str, list[tuple[int, int]]]:
+    """
+    Sizes every resource is rendered at most of the time: background
+    sprites fill a whole word box, letters are either ascii art letters
+    or letters of words up to a certain length.
+    """
+
+    letter_sizes = {(round(RESOURCE_LETTER_WIDTH), round(RESOURCE_LETTER_HEIGHT))}
+    for letter_count in range(1, ATLAS_MAX_WORD_LENGTH + 1):
+        _, _, width, height = AnimatedWord.get_letter_layout(
+            letter_count, SPRITE_SIZE, SPRITE_SIZE
+        )
+        letter_sizes.add((round(width), round(height)))
+
+    names = sorted({file.rsplit("_", 1)[0] for file in os.listdir(ASSETS_DIR)})
+    return {
+        name: [(SPRITE_SIZE, SPRITE_SIZE)]
+        if name == BACKGROUND_SPRITE_FILENAME
+        else sorted(letter_sizes)
+        for name in names
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(
+        prog="baba-build-assets",
+        description="Precompute derived asset data that is shipped with the package",
+    )
+    parser.add_argument(
+        "--color_ramp_file",
+        default=COLOR_RAMP_FILE,
+        help="Where to write the precomputed ascii color ramp to",
+    )
+    parser.add_argument(
+        "--atlas_file",
+        default=SPRITE_ATLAS_FILE,
+        help="Where to write the packed sprite atlas to",
+    )
+    parser.add_argument(
+        "--atlas_index_file",
+        default=SPRITE_ATLAS_INDEX_FILE,
+        help="Where to write the sprite atlas index to",
+    )
+    args = parser.parse_args()
+
+    write_ascii_color_ramp(args.color_ramp_file)
+    SpriteAtlas.build(get_atlas_sizes(), args.atlas_file, args.atlas_index_file)
+
+
+if __name__ == "__main__":
+    main_cli()
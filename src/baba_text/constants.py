@@ -1,5 +1,8 @@
 import os
-import urllib
+import json
+import hashlib
+import urllib.parse
+from functools import cache
 from .color import Color
 from PIL import Image
 import numpy as np
@@ -21,16 +24,47 @@ BACKGROUND_SPRITE_FILENAME = "sprite"
 COLOR_BYTE_DEPTH = 4
 GIF_DISPOSAL_MODE_TRANSPARENT = 2
 GIF_DISPOSAL_MODE_SOLID = 0
+GIF_DISPOSAL_MODE_KEEP = 1
 FULL_ALPHA = 255
 GIF_LOOP_MODE = 0
-GIF_PLUGIN = "pillow"
-GIF_FORMAT_HINT = ".gif"
+OUTPUT_FORMAT_GIF = "gif"
+OUTPUT_FORMAT_WEBP = "webp"
+OUTPUT_FORMAT_WEBP_LOSSY = "webp-lossy"
+OUTPUT_FORMAT_APNG = "apng"
+OUTPUT_FORMAT_SPRITE_SHEET = "sprite-sheet"
+# Output format -> file extension
+OUTPUT_FORMATS = {
+    OUTPUT_FORMAT_GIF: "gif",
+    OUTPUT_FORMAT_WEBP: "webp",
+    OUTPUT_FORMAT_WEBP_LOSSY: "webp",
+    OUTPUT_FORMAT_APNG: "png",
+    OUTPUT_FORMAT_SPRITE_SHEET: "png",
+}
+# Fastest webp encoder effort, still smaller than gif for our frames.
+WEBP_METHOD = 0
+WEBP_LOSSY_QUALITY = 80
+SPRITE_SHEET_METADATA_KEY = "baba_text_frames"
+GIF_MAX_PALETTE_SIZE = 256
 LETTER_SAMPLE_MODE = Image.Resampling.NEAREST
 DOWNSCALE_SAMPLE_MODE = Image.Resampling.NEAREST
 DEFAULT_PIXEL_PER_CHARACTERS = 30
+SPRITE_CACHE_MAX_ENTRIES = 1024
+ATLAS_MAX_WORD_LENGTH = 16
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_MAX_DISK_BYTES = 1024 * 1024 * 1024
+WORD_TILE_CACHE_MAX_ENTRIES = 512
+WORD_TILE_VARIANTS = 4
+RENDER_POOL_MAX_JOBS_PER_WORKER = 100
+RENDER_PRIORITY_CHEAP = 0
+RENDER_PRIORITY_EXPENSIVE = 1
+RENDER_SCHEDULER_MAX_BUCKETS = 10000
 
 # Figure out where we are and build path from there...
-ASSETS_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "__assets__") 
+PACKAGE_DIR = os.path.abspath(os.path.dirname(__file__))
+ASSETS_DIR = os.path.join(PACKAGE_DIR, "__assets__")
+COLOR_RAMP_FILE = os.path.join(PACKAGE_DIR, "color_ramp.json")
+SPRITE_ATLAS_FILE = os.path.join(PACKAGE_DIR, "sprite_atlas.npy")
+SPRITE_ATLAS_INDEX_FILE = os.path.join(PACKAGE_DIR, "sprite_atlas.json")
 
 
 def get_allowed_characters() -> set[str]:
@@ -92,6 +126,49 @@ def generate_ascii_color_ramp() -> str:
     )
 
 
+@cache
+def get_assets_digest() -> str:
+    """
+    Cheap fingerprint of the asset set (file names and sizes),
+    used to check that precomputed artifacts are still valid.
+    """
+
+    digest = hashlib.sha256()
+    for file in sorted(os.listdir(ASSETS_DIR)):
+        digest.update(file.encode())
+        digest.update(str(os.path.getsize(os.path.join(ASSETS_DIR, file))).encode())
+    return digest.hexdigest()
+
+
+def write_ascii_color_ramp(filename: str = COLOR_RAMP_FILE) -> str:
+    """
+    Generate the color ramp and store it next to the assets it was made from.
+    """
+
+    color_ramp = generate_ascii_color_ramp()
+    with open(filename, "w") as f:
+        json.dump({"assets_digest": get_assets_digest(), "color_ramp": color_ramp}, f)
+    return color_ramp
+
+
+@cache
+def get_ascii_color_ramp() -> str:
+    """
+    Color ramp used by default. Loaded from the precomputed file if it matches
+    the current assets, otherwise generated (once per process).
+    """
+
+    try:
+        with open(COLOR_RAMP_FILE) as f:
+            precomputed = json.load(f)
+        if precomputed["assets_digest"] == get_assets_digest():
+            return precomputed["color_ramp"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    return generate_ascii_color_ramp()
+
+
 COLOR_PALETTE = {
     "grey": Color(128, 128, 128),
     "yellow": Color(255, 255, 60),
@@ -113,6 +190,9 @@ COLOR_PALETTE = {
     "light_blue": Color(60, 160, 255),
 }
 
+# Colors ascii art can be snapped to in palette mode.
+ASCII_COLOR_PALETTE = list(COLOR_PALETTE.values()) + [COLOR_WHITE, TRANSPARENT_COLOR]
+
 KNOWN_WORDS_TO_COLOR = {
     "baba": COLOR_PALETTE["red"],
     "You": COLOR_PALETTE["red"],
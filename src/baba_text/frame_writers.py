@@ -0,0 +1,149 @@
+from typing import BinaryIO
+import json
+import math
+import numpy as np
+from PIL import Image, PngImagePlugin
+from .instrumentation import measure, count
+from .constants import (
+    GIF_LOOP_MODE,
+    OUTPUT_FORMAT_WEBP,
+    OUTPUT_FORMAT_WEBP_LOSSY,
+    OUTPUT_FORMAT_APNG,
+    OUTPUT_FORMAT_SPRITE_SHEET,
+    WEBP_METHOD,
+    WEBP_LOSSY_QUALITY,
+    SPRITE_SHEET_METADATA_KEY,
+)
+
+
+class AnimationWriter:
+    """
+    Writes rgba frames as animated webp (lossless or lossy) or apng.
+    Pillow encodes these in one go, so unlike GifWriter all frames are
+    kept until the writer is closed.
+    """
+
+    def __init__(
+        self, fp: BinaryIO, output_format: str, loop: int = GIF_LOOP_MODE
+    ) -> None:
+        self.__fp = fp
+        self.__loop = loop
+        if output_format == OUTPUT_FORMAT_APNG:
+            self.__params: dict = {"format": "png"}
+        elif output_format == OUTPUT_FORMAT_WEBP:
+            self.__params = {"format": "webp", "lossless": True, "method": WEBP_METHOD}
+        elif output_format == OUTPUT_FORMAT_WEBP_LOSSY:
+            self.__params = {
+                "format": "webp",
+                "quality": WEBP_LOSSY_QUALITY,
+                "method": WEBP_METHOD,
+            }
+        else:
+            raise ValueError(f"Unknown animation format: {output_format}")
+        self.__frames: list[np.ndarray] = []
+        self.__durations: list[int] = []
+
+    def __enter__(self) -> "AnimationWriter":
+        return self
+
+    def __exit__(self, exception_type, *_) -> None:
+        if exception_type is None:
+            self.close()
+
+    def write_frame(self, frame: np.ndarray, duration: float) -> None:
+        assert not self.__frames or frame.shape == self.__frames[0].shape, (
+            "All frames must have the same size"
+        )
+        # Frames may be buffers the caller reuses for the next one.
+        self.__frames.append(frame.copy())
+        self.__durations.append(round(duration))
+
+    def close(self) -> None:
+        assert self.__frames, "Animation must have at least one frame"
+        with measure("image_write"):
+            images = [Image.fromarray(frame, "RGBA") for frame in self.__frames]
+            start = self.__fp.tell()
+            images[0].save(
+                self.__fp,
+                save_all=True,
+                append_images=images[1:],
+                duration=self.__durations,
+                loop=self.__loop,
+                **self.__params,
+            )
+            count("image_bytes_total", self.__fp.tell() - start)
+        self.__frames.clear()
+
+
+class SpriteSheetWriter:
+    """
+    Writes all rgba frames into a single png, row by row on a square-ish
+    grid, for clients that animate the frames themselves. Where the frames
+    are and how long they show is stored as json in a png text chunk,
+    see get_metadata.
+    """
+
+    def __init__(self, fp: BinaryIO, loop: int = GIF_LOOP_MODE) -> None:
+        self.__fp = fp
+        self.__loop = loop
+        self.__frames: list[np.ndarray] = []
+        self.__durations: list[int] = []
+
+    def __enter__(self) -> "SpriteSheetWriter":
+        return self
+
+    def __exit__(self, exception_type, *_) -> None:
+        if exception_type is None:
+            self.close()
+
+    def write_frame(self, frame: np.ndarray, duration: float) -> None:
+        assert not self.__frames or frame.shape == self.__frames[0].shape, (
+            "All frames must have the same size"
+        )
+        self.__frames.append(frame.copy())
+        self.__durations.append(round(duration))
+
+    def get_metadata(self) -> dict:
+        assert self.__frames, "Sprite sheet must have at least one frame"
+        height, width = self.__frames[0].shape[:2]
+        return {
+            "frame_width": width,
+            "frame_height": height,
+            "frame_count": len(self.__frames),
+            "columns": math.ceil(math.sqrt(len(self.__frames))),
+            "durations": self.__durations,
+            "loop": self.__loop,
+        }
+
+    def close(self) -> None:
+        metadata = self.get_metadata()
+        with measure("image_write"):
+            columns = metadata["columns"]
+            rows = math.ceil(len(self.__frames) / columns)
+            height, width = metadata["frame_height"], metadata["frame_width"]
+            sheet = np.zeros((rows * height, columns * width, 4), dtype=np.uint8)
+            for i, frame in enumerate(self.__frames):
+                row, column = divmod(i, columns)
+                sheet[
+                    row * height : (row + 1) * height,
+                    column * width : (column + 1) * width,
+                ] = frame
+
+            info = PngImagePlugin.PngInfo()
+            info.add_text(SPRITE_SHEET_METADATA_KEY, json.dumps(metadata))
+            start = self.__fp.tell()
+            Image.fromarray(sheet, "RGBA").save(self.__fp, format="png", pnginfo=info)
+            count("image_bytes_total", self.__fp.tell() - start)
+        self.__frames.clear()
+
+
+def open_frame_writer(
+    fp: BinaryIO, output_format: str, loop: int = GIF_LOOP_MODE
+) -> AnimationWriter | SpriteSheetWriter:
+    """
+    Writer for rgba frames in any output format but gif, gif has its
+    own GifWriter that also takes indexed frames.
+    """
+    if output_format == OUTPUT_FORMAT_SPRITE_SHEET:
+        return SpriteSheetWriter(fp, loop)
+    return AnimationWriter(fp, output_format, loop)
@@ -0,0 +1,326 @@
+from typing import BinaryIO
+import struct
+import numpy as np
+from PIL import Image, GifImagePlugin
+from .color import Color
+from .instrumentation import measure, count
+from .constants import (
+    GIF_LOOP_MODE,
+    GIF_DISPOSAL_MODE_SOLID,
+    GIF_DISPOSAL_MODE_TRANSPARENT,
+    GIF_DISPOSAL_MODE_KEEP,
+    GIF_MAX_PALETTE_SIZE,
+    TRANSPARENT_COLOR,
+)
+
+# left, top, right, bottom
+Box = tuple[int, int, int, int]
+
+
+class GifWriter:
+    """
+    Encodes gif frames one by one as they are produced, so only the
+    frame currently being written has to be kept in memory.
+
+    Without a palette frames are rgba images that get quantized one by one.
+    With a palette frames are 2D arrays of indices into it, written as is.
+
+    When optimizing only the part of a frame that changed since the last one
+    is written, unchanged pixels inside of it are made transparent when that
+    helps them compress. Identical frames are merged. The disposal mode passed in
+    only decides what transparent pixels mean: with GIF_DISPOSAL_MODE_TRANSPARENT
+    they show the background, otherwise they keep showing the previous frame.
+    """
+
+    def __init__(
+        self,
+        fp: BinaryIO,
+        loop: int = GIF_LOOP_MODE,
+        disposal: int = GIF_DISPOSAL_MODE_SOLID,
+        palette: list[Color] | None = None,
+        optimize: bool = True,
+    ) -> None:
+        assert palette is None or 0 < len(palette) <= GIF_MAX_PALETTE_SIZE
+        self.__fp = fp
+        self.__loop = loop
+        self.__disposal = disposal
+        self.__palette = palette
+        self.__optimize = optimize
+        self.__size: tuple[int, int] | None = None
+
+        # Gif only knows a single fully transparent palette entry.
+        # If there is none and there is still space one is added for optimizing.
+        self.__transparency = None
+        if palette is not None:
+            self.__transparency = next(
+                (i for i, color in enumerate(palette) if color.a == 0), None
+            )
+            if (
+                self.__transparency is None
+                and optimize
+                and len(palette) < GIF_MAX_PALETTE_SIZE
+            ):
+                self.__palette = palette + [TRANSPARENT_COLOR]
+                self.__transparency = len(palette)
+
+        # Frames with index palettes without transparent entry can not be cleared.
+        self.__clear_transparent = disposal == GIF_DISPOSAL_MODE_TRANSPARENT and (
+            palette is None or self.__transparency is not None
+        )
+
+        # The frame waiting to be written (frame, duration, changed box)
+        # together with what was shown before it.
+        self.__pending: tuple[np.ndarray, float, Box] | None = None
+        self.__canvas: np.ndarray | None = None
+
+    def __enter__(self) -> "GifWriter":
+        return self
+
+    def __exit__(self, exception_type, *_) -> None:
+        # A failed rendering is not a gif anyway, do not hide its error.
+        if exception_type is None:
+            self.close()
+
+    def write_frame(self, frame: np.ndarray, duration: float) -> None:
+        with measure("gif_write"):
+            self.__write_frame(frame, duration)
+
+    def __write_frame(self, frame: np.ndarray, duration: float) -> None:
+        if self.__size is None:
+            self.__write_header((frame.shape[1], frame.shape[0]))
+        assert (frame.shape[1], frame.shape[0]) == self.__size, (
+            "All frames must have the same size"
+        )
+
+        if not self.__optimize:
+            self.__write_frame_data(
+                frame, (0, 0) + self.__size, self.__disposal, duration
+            )
+            return
+
+        if self.__pending is None:
+            self.__canvas = self.__empty_like(frame)
+            self.__pending = (frame, duration, (0, 0) + self.__size)
+            return
+
+        assert self.__canvas is not None
+        pending_frame, pending_duration, pending_box = self.__pending
+        shown = self.__show(self.__canvas, pending_frame)
+        changed = self.__changed(shown, frame)
+
+        box = GifWriter.__bounding_box(changed)
+        if box is None:
+            self.__pending = (pending_frame, pending_duration + duration, pending_box)
+            return
+
+        # Pixels that have to become transparent again can only be
+        # cleared by disposing the previous frame to the background.
+        disposal = GIF_DISPOSAL_MODE_KEEP
+        if self.__clear_transparent:
+            clear_box = GifWriter.__bounding_box(
+                ~self.__is_transparent(shown) & self.__is_transparent(frame)
+            )
+            if clear_box is not None:
+                disposal = GIF_DISPOSAL_MODE_TRANSPARENT
+                pending_box = GifWriter.__union(pending_box, clear_box)
+
+        self.__write_pending(pending_frame, pending_duration, pending_box, disposal)
+        shown = self.__dispose(shown, pending_box, disposal)
+        if disposal == GIF_DISPOSAL_MODE_TRANSPARENT:
+            # Disposing also cleared pixels the frame still shows unchanged,
+            # they have to be drawn again. If everything that changed was
+            # cleared the frame still needs some box to be written at all.
+            box = GifWriter.__bounding_box(self.__changed(shown, frame)) or (0, 0, 1, 1)
+
+        self.__canvas = shown
+        self.__pending = (frame, duration, box)
+
+    def close(self) -> None:
+        assert self.__size is not None, "Gif must have at least one frame"
+
+        if self.__pending is not None:
+            with measure("gif_write"):
+                self.__write_last_frame()
+
+        self.__fp.write(b";")
+        if hasattr(self.__fp, "flush"):
+            self.__fp.flush()
+
+    def __write_last_frame(self) -> None:
+        assert self.__pending is not None and self.__canvas is not None
+        frame, duration, box = self.__pending
+        disposal = GIF_DISPOSAL_MODE_KEEP
+        if self.__clear_transparent:
+            # Leave nothing behind, the animation starts over from a clean canvas.
+            disposal = GIF_DISPOSAL_MODE_TRANSPARENT
+            visible_box = GifWriter.__bounding_box(
+                ~self.__is_transparent(self.__show(self.__canvas, frame))
+            )
+            if visible_box is not None:
+                box = GifWriter.__union(box, visible_box)
+        self.__write_pending(frame, duration, box, disposal)
+        self.__pending = None
+
+    def __write_pending(
+        self, frame: np.ndarray, duration: float, box: Box, disposal: int
+    ) -> None:
+        assert self.__canvas is not None
+        left, top, right, bottom = box
+        frame = frame[top:bottom, left:right]
+        canvas = self.__canvas[top:bottom, left:right]
+
+        # Let unchanged pixels show through, if that makes
+        # the frame simpler (fewer color changes along rows) to compress.
+        unchanged = ~self.__changed(canvas, frame)
+        if self.__palette is None:
+            see_through = GifWriter.__from_pixels(
+                np.where(unchanged, np.uint32(0), GifWriter.__as_pixels(frame))
+            )
+        elif self.__transparency is not None:
+            see_through = np.where(unchanged, np.uint8(self.__transparency), frame)
+        else:
+            see_through = frame
+        if GifWriter.__transitions(see_through) <= GifWriter.__transitions(frame):
+            frame = see_through
+
+        self.__write_frame_data(frame, box, disposal, duration)
+
+    def __write_frame_data(
+        self, frame: np.ndarray, box: Box, disposal: int, duration: float
+    ) -> None:
+        if self.__palette is None:
+            with measure("gif_quantize"):
+                indexed, transparency = GifWriter.__quantize(frame)
+        else:
+            # Mode L is encoded byte by byte just like P, and needs no palette.
+            indexed, transparency = Image.fromarray(frame, "L"), self.__transparency
+
+        params: dict = {
+            "duration": duration,
+            "disposal": disposal,
+            "include_color_table": self.__palette is None,
+        }
+        if transparency is not None:
+            params["transparency"] = transparency
+
+        with measure("gif_encode"):
+            for chunk in GifImagePlugin.getdata(indexed, box[:2], **params):
+                self.__fp.write(chunk)
+                count("gif_bytes_total", len(chunk))
+
+    def __is_transparent(self, frame: np.ndarray) -> np.ndarray:
+        if self.__palette is None:
+            return frame[:, :, 3] == 0
+        if self.__transparency is None:
+            return np.zeros(frame.shape, dtype=np.bool_)
+        return frame == self.__transparency
+
+    def __empty_like(self, frame: np.ndarray) -> np.ndarray:
+        if self.__palette is None or self.__transparency is None:
+            return np.zeros_like(frame)
+        return np.full_like(frame, self.__transparency)
+
+    def __show(self, canvas: np.ndarray, frame: np.ndarray) -> np.ndarray:
+        """
+        What is on screen after drawing frame on top of canvas.
+        """
+        shown = np.where(
+            self.__is_transparent(frame),
+            GifWriter.__as_pixels(canvas),
+            GifWriter.__as_pixels(frame),
+        )
+        return shown if self.__palette is not None else GifWriter.__from_pixels(shown)
+
+    def __changed(self, shown: np.ndarray, frame: np.ndarray) -> np.ndarray:
+        """
+        Pixels of frame that differ from what is shown.
+        """
+        transparent = self.__is_transparent(frame)
+        different = GifWriter.__as_pixels(shown) != GifWriter.__as_pixels(frame)
+
+        if self.__clear_transparent:
+            return different & ~(transparent & self.__is_transparent(shown))
+        return different & ~transparent
+
+    def __dispose(self, shown: np.ndarray, box: Box, disposal: int) -> np.ndarray:
+        if disposal != GIF_DISPOSAL_MODE_TRANSPARENT:
+            return shown
+        left, top, right, bottom = box
+        shown = shown.copy()
+        shown[top:bottom, left:right] = self.__empty_like(shown[top:bottom, left:right])
+        return shown
+
+    @staticmethod
+    def __transitions(frame: np.ndarray) -> int:
+        pixels = GifWriter.__as_pixels(frame)
+        return int(np.count_nonzero(pixels[:, 1:] != pixels[:, :-1]))
+
+    @staticmethod
+    def __as_pixels(frame: np.ndarray) -> np.ndarray:
+        """
+        One value per pixel, rgba frames as a 2D uint32 view. Comparing whole
+        pixels is a lot faster than comparing 4 bytes and reducing over them.
+        """
+        if frame.ndim == 2:
+            return frame
+        if frame.strides[2] != frame.itemsize:
+            frame = np.ascontiguousarray(frame)
+        return frame.view(np.uint32)[..., 0]
+
+    @staticmethod
+    def __from_pixels(pixels: np.ndarray) -> np.ndarray:
+        """
+        Rgba frame of a 2D uint32 array from __as_pixels.
+        """
+        return pixels[..., None].view(np.uint8)
+
+    @staticmethod
+    def __bounding_box(mask: np.ndarray) -> Box | None:
+        rows = np.flatnonzero(mask.any(axis=1))
+        if len(rows) == 0:
+            return None
+        columns = np.flatnonzero(mask.any(axis=0))
+        return (int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1)
+
+    @staticmethod
+    def __union(a: Box, b: Box) -> Box:
+        return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+    @staticmethod
+    def __quantize(frame: np.ndarray) -> tuple[Image.Image, int | None]:
+        # Same quantization pillow uses when saving rgba images as gif.
+        indexed = Image.fromarray(np.ascontiguousarray(frame), "RGBA").convert(
+            "P", palette=Image.Palette.ADAPTIVE
+        )
+        transparency = None
+        if indexed.palette.mode == "RGBA":
+            for rgba, index in indexed.palette.colors.items():
+                if rgba[3] == 0:
+                    transparency = index
+                    break
+        indexed.putpalette(indexed.getpalette("RGB"))
+        return indexed, transparency
+
+    def __write_header(self, size: tuple[int, int]) -> None:
+        self.__size = size
+
+        if self.__palette is None:
+            # No global color table, every frame brings its own.
+            self.__fp.write(
+                b"GIF89a" + struct.pack("<HHBBB", size[0], size[1], 0, 0, 0)
+            )
+        else:
+            # Color table size is stored as log2(entries) - 1, padded with black.
+            table_size = max(len(self.__palette) - 1, 1).bit_length() - 1
+            color_table = bytearray(3 * (2 << table_size))
+            for i, color in enumerate(self.__palette):
+                color_table[3 * i : 3 * i + 3] = bytes(color[:3])
+            self.__fp.write(
+                b"GIF89a"
+                + struct.pack("<HHBBB", size[0], size[1], 0x80 | table_size, 0, 0)
+                + color_table
+            )
+        if self.__loop is not None:
+            self.__fp.write(
+                b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", self.__loop) + b"\0"
+            )
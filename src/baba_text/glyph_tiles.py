@@ -0,0 +1,174 @@
+import numpy as np
+from .animated_letter import AnimatedLetter
+from .rect import Rect
+from .color import Color
+from .constants import (
+    SPACE,
+    COLOR_BYTE_DEPTH,
+    RESOURCE_LETTER_WIDTH,
+    RESOURCE_LETTER_HEIGHT,
+)
+
+
+class GlyphTiles:
+    """
+    Every character of a color ramp in every animation frame, drawn into
+    square cells and stacked into one (glyph, animation, height, width, rgba) array.
+    Whole screens are then built by indexing this array with a grid of
+    glyph indices and a grid of animation states.
+    """
+
+    def __init__(
+        self, tiles: np.ndarray, coverage: np.ndarray, frame_counts: np.ndarray
+    ) -> None:
+        self.__tiles = tiles
+        self.__coverage = coverage
+        self.__frame_counts = frame_counts
+
+    @staticmethod
+    def from_characters(
+        characters: str,
+        foreground_color: Color,
+        background_color: Color,
+    ) -> "GlyphTiles":
+        letters = [
+            None
+            if character == SPACE
+            else AnimatedLetter(
+                character,
+                Rect(0, 0, RESOURCE_LETTER_WIDTH, RESOURCE_LETTER_HEIGHT),
+                foreground_color,
+                background_color,
+            )
+            for character in characters
+        ]
+
+        frame_counts = np.array(
+            [1 if letter is None else letter.animation_frame_count for letter in letters]
+        )
+        animation_count = int(frame_counts.max())
+
+        # Not a typo: We make the letter boxes square so we dont
+        # change the image aspect ratio.
+        cells_shape = (
+            len(characters),
+            animation_count,
+            RESOURCE_LETTER_HEIGHT,
+            RESOURCE_LETTER_HEIGHT,
+        )
+        tiles = np.full(
+            cells_shape + (COLOR_BYTE_DEPTH,), background_color, dtype=np.uint8
+        )
+        coverage = np.zeros(cells_shape, dtype=np.bool_)
+
+        # Glyphs with fewer animation frames repeat them to fill the array.
+        for glyph, letter in enumerate(letters):
+            if letter is None:
+                continue
+            for animation in range(animation_count):
+                letter.animation_index = animation
+                letter.draw(tiles[glyph, animation])
+                mask = letter.foreground_mask
+                coverage[glyph, animation, : mask.shape[0], : mask.shape[1]] = mask
+
+        return GlyphTiles(tiles, coverage, frame_counts)
+
+    @property
+    def tiles(self) -> np.ndarray:
+        return self.__tiles
+
+    @property
+    def coverage(self) -> np.ndarray:
+        return self.__coverage
+
+    @property
+    def glyph_count(self) -> int:
+        return self.__tiles.shape[0]
+
+    @property
+    def animation_count(self) -> int:
+        return self.__tiles.shape[1]
+
+    @property
+    def cell_size(self) -> int:
+        return self.__tiles.shape[2]
+
+    def tint(self, palette: list[Color]) -> "GlyphTiles":
+        """
+        Pre-color all tiles with every palette color. Glyph i in color j
+        of the result has the glyph index j * glyph_count + i.
+        """
+        colors = np.array(palette, dtype=np.uint8)[:, None, None, None, None, :]
+        tinted = np.where(self.__coverage[None, ..., None], colors, self.__tiles[None])
+        return GlyphTiles(
+            tinted.reshape((-1,) + self.__tiles.shape[1:]),
+            np.tile(self.__coverage, (len(palette), 1, 1, 1)),
+            np.tile(self.__frame_counts, len(palette)),
+        )
+
+    def to_indices(
+        self, foreground_indices: int | np.ndarray, background_index: int
+    ) -> "GlyphTiles":
+        """
+        Tiles holding palette indices instead of colors. Either all glyphs
+        use the same foreground index or every glyph gets its own.
+        """
+        foreground = np.asarray(foreground_indices, dtype=np.uint8)
+        if foreground.ndim == 1:
+            foreground = foreground[:, None, None, None]
+        return GlyphTiles(
+            np.where(self.__coverage, foreground, np.uint8(background_index)),
+            self.__coverage,
+            self.__frame_counts,
+        )
+
+    def compose(
+        self,
+        glyphs: np.ndarray,
+        animation_states: np.ndarray,
+        colors: np.ndarray | None = None,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Build a screen from a grid of glyph indices and animation states.
+        If colors (one rgba value per cell) are given the glyphs are drawn in them.
+        Tiles of palette indices compose into a 2D screen of indices.
+        The screen is written to out if given, which must be C contiguous.
+        """
+        rows, columns = glyphs.shape
+        cells = self.__tiles[glyphs, animation_states]
+
+        if colors is not None:
+            cells = np.where(
+                self.__coverage[glyphs, animation_states][..., None],
+                colors[:, :, None, None, :],
+                cells,
+            )
+
+        shape = (rows * self.cell_size, columns * self.cell_size) + cells.shape[4:]
+        if out is None:
+            return cells.swapaxes(1, 2).reshape(shape)
+
+        assert out.shape == shape and out.flags.c_contiguous
+        # View out as (row, column, cell y, cell x) and copy all cells at once.
+        out.reshape(
+            (rows, self.cell_size, columns, self.cell_size) + cells.shape[4:]
+        ).swapaxes(1, 2)[...] = cells
+        return out
+
+    def advance_animation(
+        self,
+        glyphs: np.ndarray,
+        animation_states: np.ndarray,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        """
+        Same rules as AnimatedObject.advance_animation, for every cell at once.
+        """
+        frame_counts = self.__frame_counts[glyphs]
+        offsets = np.where(
+            frame_counts > 2,
+            1 + np.floor(rng.random(glyphs.shape) * (frame_counts - 1)),
+            1,
+        ).astype(np.intp)
+        return (animation_states + offsets) % frame_counts
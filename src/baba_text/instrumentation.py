@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+import time
+
+
+@dataclass
+class Metrics:
+    """
+    Counters and per stage durations (count and total seconds) of everything
+    rendered while these metrics were active, see set_metrics.
+    """
+
+    counters: dict[str, float] = field(default_factory=dict)
+    stage_counts: dict[str, int] = field(default_factory=dict)
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+
+    def add(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def merge(self, other: "Metrics") -> None:
+        """
+        Add the numbers of other, e.g. metrics sent back by a worker process.
+        """
+        for name, value in other.counters.items():
+            self.add(name, value)
+        for stage, count in other.stage_counts.items():
+            self.stage_counts[stage] = self.stage_counts.get(stage, 0) + count
+            self.stage_seconds[stage] = (
+                self.stage_seconds.get(stage, 0.0) + other.stage_seconds[stage]
+            )
+
+    def to_prometheus(self, prefix: str = "baba_text") -> str:
+        """
+        Prometheus text exposition format. Stages are one summary
+        labeled by stage, every counter is its own metric.
+        """
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per rendering stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage in sorted(self.stage_counts):
+            labels = f'{{stage="{stage}"}}'
+            lines.append(
+                f"{prefix}_stage_seconds_count{labels} {self.stage_counts[stage]}"
+            )
+            lines.append(
+                f"{prefix}_stage_seconds_sum{labels} {self.stage_seconds[stage]}"
+            )
+        for name in sorted(self.counters):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {self.counters[name]}")
+        return "\n".join(lines) + "\n"
+
+
+# Instrumentation is off unless metrics are set, then it costs a dict update.
+_active_metrics: Metrics | None = None
+
+
+def get_metrics() -> Metrics | None:
+    return _active_metrics
+
+
+def set_metrics(metrics: Metrics | None) -> None:
+    """
+    Record into metrics from now on, None turns instrumentation off.
+    """
+    global _active_metrics
+    _active_metrics = metrics
+
+
+@contextmanager
+def collect_metrics() -> Iterator[Metrics]:
+    """
+    Record everything inside the with block into new metrics.
+    """
+    previous = _active_metrics
+    metrics = Metrics()
+    set_metrics(metrics)
+    try:
+        yield metrics
+    finally:
+        set_metrics(previous)
+
+
+@contextmanager
+def measure(stage: str) -> Iterator[None]:
+    metrics = _active_metrics
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(stage, time.perf_counter() - start)
+
+
+def count(name: str, value: float = 1) -> None:
+    if _active_metrics is not None:
+        _active_metrics.add(name, value)
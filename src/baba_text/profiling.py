@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from typing import Callable
+import argparse
+import cProfile
+import statistics
+import time
+from .instrumentation import collect_metrics
+
+# Summary stage -> instrumented stages it is made of. Only stages that never
+# run inside each other are listed, so no time is counted twice.
+STAGE_GROUPS = {
+    "decode": ("ascii_decode",),
+    "convert": (
+        "text_layout",
+        "word_tile_render",
+        "ascii_glyph_tiles",
+        "ascii_map",
+        "ascii_quantize",
+    ),
+    "composite": ("text_composite", "ascii_composite"),
+    "encode": ("gif_write", "image_write"),
+}
+
+
+@dataclass
+class ProfileReport:
+    """
+    Wall time and instrumented stage durations of every run.
+    """
+
+    durations: list[float] = field(default_factory=list)
+    stage_seconds: list[dict[str, float]] = field(default_factory=list)
+
+    def get_group_seconds(self, group: str) -> list[float]:
+        return [
+            sum(stages.get(stage, 0.0) for stage in STAGE_GROUPS[group])
+            for stages in self.stage_seconds
+        ]
+
+    def format(self) -> str:
+        rows = [("total", self.durations)]
+        rows += [(group, self.get_group_seconds(group)) for group in STAGE_GROUPS]
+        lines = [
+            f"{len(self.durations)} run(s)",
+            f"{'stage':12} {'min':>9} {'median':>9}",
+        ]
+        for name, seconds in rows:
+            lines.append(
+                f"{name:12} {min(seconds):9.4f} {statistics.median(seconds):9.4f}"
+            )
+        return "\n".join(lines)
+
+
+def add_profiling_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help="Write a cProfile dump (see pstats) to FILE and print stage timings",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Render this many times and print min and median stage timings",
+    )
+
+
+def run_profiled(
+    render: Callable[[], object], repeat: int = 1, profile_file: str | None = None
+) -> ProfileReport:
+    """
+    Call render repeat times, timing its stages. With a profile_file
+    all runs are profiled together and the stats are dumped there.
+    """
+    assert repeat > 0
+    report = ProfileReport()
+    profiler = cProfile.Profile() if profile_file is not None else None
+
+    for _ in range(repeat):
+        with collect_metrics() as metrics:
+            start = time.perf_counter()
+            if profiler is not None:
+                profiler.runcall(render)
+            else:
+                render()
+            report.durations.append(time.perf_counter() - start)
+        report.stage_seconds.append(metrics.stage_seconds)
+
+    if profiler is not None:
+        profiler.dump_stats(profile_file)
+    return report
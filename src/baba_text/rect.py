@@ -1,4 +1,6 @@
 class Rect:
+    __slots__ = ("__left", "__top", "__width", "__height")
+
     def __init__(self, left: float, top: float, width: float, height: float) -> None:
         self.__left = round(left)
         self.__top = round(top)
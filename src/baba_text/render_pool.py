@@ -0,0 +1,232 @@
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Callable
+import asyncio
+import functools
+import multiprocessing
+import queue
+import threading
+import traceback
+from .constants import RENDER_POOL_MAX_JOBS_PER_WORKER
+
+# Fork shares everything loaded before the pool starts with the workers.
+DEFAULT_START_METHOD = (
+    "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+)
+
+# Workers replacing recycled or crashed ones start while the pool's threads
+# are running, and forking a process with threads is not safe. They come from
+# a fork server instead, a single threaded process with the package preloaded.
+REPLACEMENT_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+)
+FORK_SERVER_PRELOAD = ["baba_text.animated_text", "baba_text.animated_ascii_art"]
+
+
+def serve_render_jobs(connection: Connection, max_jobs: int) -> None:
+    """
+    Worker loop: run (function, args) jobs until max_jobs are done or
+    None is received. Sends back ("ok", result) or ("error", traceback).
+    """
+    for _ in range(max_jobs):
+        job = connection.recv()
+        if job is None:
+            break
+        function, args = job
+        try:
+            connection.send(("ok", function(*args)))
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+    connection.close()
+
+
+class RenderWorker:
+    """
+    One worker process and the pipe to talk to it.
+    """
+
+    def __init__(self, context: Any, max_jobs: int) -> None:
+        self.__max_jobs = max_jobs
+        self.__job_count = 0
+        self.__connection, child_connection = context.Pipe()
+        self.__process = context.Process(
+            target=serve_render_jobs, args=(child_connection, max_jobs), daemon=True
+        )
+        self.__process.start()
+        child_connection.close()
+
+    def run(self, function: Callable, args: tuple, timeout: float | None) -> Any:
+        self.__job_count += 1
+        try:
+            self.__connection.send((function, args))
+        except OSError:
+            self.kill()
+            raise RuntimeError(
+                f"Render worker died with exit code {self.__process.exitcode}"
+            )
+
+        if not self.__connection.poll(timeout):
+            self.kill()
+            raise TimeoutError(f"Render job did not finish within {timeout} seconds")
+
+        try:
+            status, value = self.__connection.recv()
+        except EOFError:
+            self.kill()
+            raise RuntimeError(
+                f"Render worker died with exit code {self.__process.exitcode}"
+            )
+
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    @property
+    def reusable(self) -> bool:
+        return self.__job_count < self.__max_jobs and self.__process.is_alive()
+
+    @property
+    def pid(self) -> int | None:
+        return self.__process.pid
+
+    def kill(self) -> None:
+        self.__process.kill()
+        self.__process.join()
+        self.__connection.close()
+
+    def close(self) -> None:
+        if self.__process.is_alive() and self.__job_count < self.__max_jobs:
+            try:
+                self.__connection.send(None)
+            except OSError:
+                pass
+        self.__process.join(timeout=1)
+        if self.__process.is_alive():
+            self.kill()
+        else:
+            self.__connection.close()
+
+
+class RenderPool:
+    """
+    Long lived worker processes that render jobs, so requests do not pay for
+    process start up. Load assets and warm caches before creating the pool,
+    forked workers then share them copy on write.
+
+    Every job runs isolated in a worker. Workers are replaced after
+    max_jobs_per_worker jobs, when they crash and when a job runs into its
+    timeout (the worker is killed, so runaway jobs really stop).
+    With fork, replacements start from a fork server (see
+    REPLACEMENT_START_METHOD) and load caches again as they need them.
+
+    Use run_async from event loops, it waits for the result in a thread
+    so the loop keeps running while jobs render.
+    """
+
+    def __init__(
+        self,
+        worker_count: int,
+        max_jobs_per_worker: int = RENDER_POOL_MAX_JOBS_PER_WORKER,
+        start_method: str | None = DEFAULT_START_METHOD,
+    ) -> None:
+        assert worker_count > 0
+        assert max_jobs_per_worker > 0
+        self.__context = multiprocessing.get_context(start_method)
+        self.__replacement_context = self.__context
+        if start_method == "fork" and REPLACEMENT_START_METHOD is not None:
+            self.__replacement_context = multiprocessing.get_context(
+                REPLACEMENT_START_METHOD
+            )
+            self.__replacement_context.set_forkserver_preload(FORK_SERVER_PRELOAD)
+        self.__max_jobs_per_worker = max_jobs_per_worker
+        self.__lock = threading.Lock()
+        # Guards closed, so no worker is put back after close took the idle ones.
+        self.__closed_lock = threading.Lock()
+        self.__closed = False
+        # None stands for a worker whose replacement could not be started.
+        self.__idle: queue.Queue[RenderWorker | None] = queue.Queue()
+        for _ in range(worker_count):
+            self.__idle.put(self.__start_worker(self.__context))
+
+        # One thread per worker is enough to keep all of them busy.
+        self.__executor = ThreadPoolExecutor(
+            max_workers=worker_count, thread_name_prefix="render-pool"
+        )
+
+    def __enter__(self) -> "RenderPool":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def run(self, function: Callable, *args: Any, timeout: float | None = None) -> Any:
+        """
+        Run function(*args) in a worker and return its result. Blocks until a
+        worker is free. Raises TimeoutError if the job takes longer than timeout
+        seconds and RuntimeError if it fails or the worker crashes.
+        Function, arguments and result are pickled.
+        """
+        assert not self.__closed, "Pool is closed"
+        worker = self.__idle.get()
+        try:
+            if worker is None:
+                # Starting a replacement failed before, try again.
+                worker = self.__start_worker(self.__replacement_context)
+            return worker.run(function, args, timeout)
+        finally:
+            self.__release(worker)
+
+    async def run_async(
+        self, function: Callable, *args: Any, timeout: float | None = None
+    ) -> Any:
+        """
+        Awaitable version of run.
+        """
+        job = functools.partial(self.run, function, *args, timeout=timeout)
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, job)
+
+    def close(self) -> None:
+        """
+        Stop the idle workers. Workers of jobs still running are stopped
+        once their job is done.
+        """
+        with self.__closed_lock:
+            self.__closed = True
+        self.__executor.shutdown()
+        while True:
+            try:
+                worker = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.close()
+
+    def __release(self, worker: RenderWorker | None) -> None:
+        """
+        Make worker available to the next job, replacing it if it can not run
+        one anymore, or stop it if the pool was closed in the meantime.
+        """
+        with self.__closed_lock:
+            closed = self.__closed
+        if worker is not None and not worker.reusable:
+            worker.close()
+            worker = None
+            if not closed:
+                try:
+                    worker = self.__start_worker(self.__replacement_context)
+                except Exception:
+                    # Do not hide the error of the job that just ran,
+                    # the next job tries to start the worker again.
+                    pass
+        with self.__closed_lock:
+            if not self.__closed:
+                self.__idle.put(worker)
+                return
+        if worker is not None:
+            worker.close()
+
+    def __start_worker(self, context: Any) -> RenderWorker:
+        # Workers may fork from this process, do not let two of them start at
+        # once or one could inherit the other's end of its pipe.
+        with self.__lock:
+            return RenderWorker(context, self.__max_jobs_per_worker)
@@ -0,0 +1,224 @@
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+import asyncio
+import time
+from .render_pool import RenderPool
+from .constants import (
+    RENDER_PRIORITY_CHEAP,
+    RENDER_PRIORITY_EXPENSIVE,
+    RENDER_SCHEDULER_MAX_BUCKETS,
+)
+
+
+class RenderRejectedError(Exception):
+    """
+    A job was not admitted, because the queue is full or a rate limit was hit.
+    """
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to capacity jobs, refilled at rate jobs per second.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        assert rate > 0 and capacity >= 1
+        self.__rate = rate
+        self.__capacity = capacity
+        self.__tokens = capacity
+        self.__updated = now
+
+    def has_token(self, now: float) -> bool:
+        self.__refill(now)
+        return self.__tokens >= 1
+
+    def try_take(self, now: float) -> bool:
+        if not self.has_token(now):
+            return False
+        self.__tokens -= 1
+        return True
+
+    def is_full(self, now: float) -> bool:
+        self.__refill(now)
+        return self.__tokens >= self.__capacity
+
+    def __refill(self, now: float) -> None:
+        self.__tokens = min(
+            self.__capacity, self.__tokens + (now - self.__updated) * self.__rate
+        )
+        self.__updated = now
+
+
+@dataclass
+class RenderSchedulerStats:
+    admitted: int = 0
+    rejected_queue_full: int = 0
+    rejected_rate_limited: int = 0
+    completed: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+@dataclass
+class RenderJob:
+    function: Callable
+    args: tuple
+    timeout: float | None
+    future: asyncio.Future
+    enqueued: float
+
+
+class RenderScheduler:
+    """
+    Bounded, fair queue in front of a RenderPool, for use from one event loop.
+
+    Jobs are rate limited per guild and per user with token buckets and
+    rejected right away when max_queue_size jobs are already waiting.
+    At most concurrency jobs run at once. Cheap jobs always go first, among
+    jobs of the same priority guilds take turns, so one busy guild can not
+    make everyone else wait behind its queue.
+    """
+
+    def __init__(
+        self,
+        pool: RenderPool,
+        concurrency: int,
+        max_queue_size: int,
+        guild_rate: float,
+        guild_burst: float,
+        user_rate: float,
+        user_burst: float,
+    ) -> None:
+        assert concurrency > 0 and max_queue_size > 0
+        self.__pool = pool
+        self.__concurrency = concurrency
+        self.__max_queue_size = max_queue_size
+        self.__guild_limit = (guild_rate, guild_burst)
+        self.__user_limit = (user_rate, user_burst)
+        self.__buckets: dict[tuple[str, Hashable], TokenBucket] = {}
+
+        # priority -> guild -> jobs of that guild in arrival order
+        self.__queues: dict[int, OrderedDict[Hashable, deque[RenderJob]]] = {
+            priority: OrderedDict()
+            for priority in (RENDER_PRIORITY_CHEAP, RENDER_PRIORITY_EXPENSIVE)
+        }
+        self.__queue_depth = 0
+        self.__running = 0
+        self.__tasks: set[asyncio.Task] = set()
+        self.__stats = RenderSchedulerStats()
+
+    async def submit(
+        self,
+        function: Callable,
+        *args: Any,
+        guild: Hashable,
+        user: Hashable,
+        priority: int = RENDER_PRIORITY_CHEAP,
+        timeout: float | None = None,
+    ) -> Any:
+        """
+        Queue function(*args) and wait for its result, see RenderPool.run.
+        Raises RenderRejectedError if the job is not admitted.
+        """
+        assert priority in self.__queues
+        now = time.monotonic()
+
+        if self.__queue_depth >= self.__max_queue_size:
+            self.__stats.rejected_queue_full += 1
+            raise RenderRejectedError("Render queue is full")
+        if len(self.__buckets) >= RENDER_SCHEDULER_MAX_BUCKETS:
+            # Forget owners that have been quiet long enough to be back at full burst.
+            self.__buckets = {
+                k: b for k, b in self.__buckets.items() if not b.is_full(now)
+            }
+        buckets = (
+            self.__get_bucket("guild", guild, self.__guild_limit, now),
+            self.__get_bucket("user", user, self.__user_limit, now),
+        )
+        # Take tokens only if both have one, a user over their limit
+        # must not use up the budget of their guild.
+        if not all(bucket.has_token(now) for bucket in buckets):
+            self.__stats.rejected_rate_limited += 1
+            raise RenderRejectedError("Too many render requests")
+        for bucket in buckets:
+            bucket.try_take(now)
+
+        job = RenderJob(
+            function, args, timeout, asyncio.get_running_loop().create_future(), now
+        )
+        self.__queues[priority].setdefault(guild, deque()).append(job)
+        self.__queue_depth += 1
+        self.__stats.admitted += 1
+        self.__dispatch()
+
+        return await job.future
+
+    @property
+    def queue_depth(self) -> int:
+        return self.__queue_depth
+
+    @property
+    def running(self) -> int:
+        return self.__running
+
+    @property
+    def stats(self) -> RenderSchedulerStats:
+        return self.__stats
+
+    def __get_bucket(
+        self, kind: str, owner: Hashable, limit: tuple[float, float], now: float
+    ) -> TokenBucket:
+        key = (kind, owner)
+        bucket = self.__buckets.get(key)
+        if bucket is None:
+            bucket = self.__buckets[key] = TokenBucket(*limit, now)
+        return bucket
+
+    def __next_job(self) -> RenderJob | None:
+        for priority in sorted(self.__queues):
+            guilds = self.__queues[priority]
+            if not guilds:
+                continue
+            # Take the oldest job of the guild whose turn it is, then move it back.
+            guild, jobs = guilds.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                guilds[guild] = jobs
+            return job
+        return None
+
+    def __dispatch(self) -> None:
+        while self.__running < self.__concurrency:
+            job = self.__next_job()
+            if job is None:
+                return
+            self.__queue_depth -= 1
+            if job.future.cancelled():
+                continue
+            self.__running += 1
+
+            wait = time.monotonic() - job.enqueued
+            self.__stats.total_wait_seconds += wait
+            self.__stats.max_wait_seconds = max(self.__stats.max_wait_seconds, wait)
+
+            # The loop only keeps weak references to tasks.
+            task = asyncio.ensure_future(self.__run(job))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+
+    async def __run(self, job: RenderJob) -> None:
+        try:
+            result = await self.__pool.run_async(
+                job.function, *job.args, timeout=job.timeout
+            )
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.__running -= 1
+            self.__stats.completed += 1
+            self.__dispatch()
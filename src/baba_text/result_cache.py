@@ -0,0 +1,220 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Callable
+import hashlib
+import os
+import threading
+from .atomic_write import open_for_replace
+from .constants import (
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MAX_DISK_BYTES,
+    get_assets_digest,
+)
+
+
+@dataclass
+class ResultCacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    disk_evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.disk_hits + self.misses
+        return 0.0 if lookups == 0 else (self.hits + self.disk_hits) / lookups
+
+
+class ResultCache:
+    """
+    LRU cache of encoded outputs (the bytes write_to_buffer returns),
+    bounded by the total size of the cached outputs.
+
+    Keys are made with make_key from everything that influences the output.
+    If a directory is given every output is also stored there under its key,
+    so results survive restarts and can be shared between processes. The
+    directory is an LRU of its own, bounded by max_disk_bytes. Every process
+    only counts the files it found on start and the ones it wrote itself.
+
+    The cache is thread safe, so reading and writing files can be moved off
+    an event loop, e.g. with run_in_executor.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        directory: str | None = None,
+        max_disk_bytes: int = RESULT_CACHE_MAX_DISK_BYTES,
+    ) -> None:
+        assert max_bytes > 0 and max_disk_bytes > 0
+        self.__max_bytes = max_bytes
+        self.__max_disk_bytes = max_disk_bytes
+        self.__directory = directory
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[str, bytes] = OrderedDict()
+        self.__size_bytes = 0
+        # Key -> size of the files in directory, least recently used first.
+        self.__files: OrderedDict[str, int] = OrderedDict()
+        self.__disk_size_bytes = 0
+        self.__stats = ResultCacheStats()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.__scan_directory()
+            self.__evict_files()
+
+    @staticmethod
+    def make_key(*parts: object) -> str:
+        """
+        Hash the parts describing an output into a key. Parts are compared by
+        their repr, so they should be plain values (str, numbers, colors, bytes).
+        The assets are part of every key, new assets never hit old results.
+        """
+        digest = hashlib.sha256(get_assets_digest().encode())
+        for part in parts:
+            digest.update(b"\0" + repr(part).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> BytesIO | None:
+        with self.__lock:
+            data = self.__entries.get(key)
+            if data is not None:
+                self.__stats.hits += 1
+                self.__entries.move_to_end(key)
+                return BytesIO(data)
+
+        data = self.__read_file(key)
+        with self.__lock:
+            if data is None:
+                self.__stats.misses += 1
+                return None
+            self.__stats.disk_hits += 1
+            self.__insert(key, data)
+            self.__add_file(key, len(data))
+        return BytesIO(data)
+
+    def put(self, key: str, data: bytes) -> None:
+        with self.__lock:
+            self.__insert(key, data)
+        if self.__write_file(key, data):
+            with self.__lock:
+                self.__add_file(key, len(data))
+            self.__evict_files()
+
+    def get_or_render(self, key: str, render: Callable[[], BytesIO]) -> BytesIO:
+        """
+        Cached output for key, render is only called on a miss.
+        """
+        result = self.get(key)
+        if result is None:
+            result = render()
+            self.put(key, result.getvalue())
+        return result
+
+    def clear(self) -> None:
+        """
+        Forget the outputs held in memory, the directory is left as is.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__size_bytes = 0
+            self.__stats = ResultCacheStats()
+
+    @property
+    def stats(self) -> ResultCacheStats:
+        return self.__stats
+
+    @property
+    def size_bytes(self) -> int:
+        return self.__size_bytes
+
+    @property
+    def disk_size_bytes(self) -> int:
+        return self.__disk_size_bytes
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __insert(self, key: str, data: bytes) -> None:
+        # Outputs larger than the whole budget would only evict everything else.
+        if len(data) > self.__max_bytes:
+            return
+
+        previous = self.__entries.pop(key, None)
+        if previous is not None:
+            self.__size_bytes -= len(previous)
+        self.__entries[key] = data
+        self.__size_bytes += len(data)
+
+        while self.__size_bytes > self.__max_bytes:
+            _, evicted = self.__entries.popitem(last=False)
+            self.__size_bytes -= len(evicted)
+            self.__stats.evictions += 1
+
+    def __add_file(self, key: str, size: int) -> None:
+        self.__disk_size_bytes += size - self.__files.pop(key, 0)
+        self.__files[key] = size
+
+    def __scan_directory(self) -> None:
+        """
+        Index the files already in the directory, by when they were last used.
+        """
+        assert self.__directory is not None
+        found = []
+        for prefix in os.scandir(self.__directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                # Temporary files of interrupted writes are no results.
+                if entry.name.endswith(".tmp") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(found):
+            self.__add_file(key, size)
+
+    def __evict_files(self) -> None:
+        with self.__lock:
+            evicted = []
+            while self.__disk_size_bytes > self.__max_disk_bytes:
+                key, size = self.__files.popitem(last=False)
+                self.__disk_size_bytes -= size
+                self.__stats.disk_evictions += 1
+                evicted.append(key)
+        for key in evicted:
+            try:
+                os.unlink(self.__path(key))
+            except FileNotFoundError:
+                # Another process sharing the directory was faster.
+                pass
+
+    def __path(self, key: str) -> str:
+        assert self.__directory is not None
+        return os.path.join(self.__directory, key[:2], key)
+
+    def __read_file(self, key: str) -> bytes | None:
+        if self.__directory is None:
+            return None
+        try:
+            with open(self.__path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # Mark it as used, so the order is kept across restarts.
+            os.utime(self.__path(key))
+        except OSError:
+            pass
+        return data
+
+    def __write_file(self, key: str, data: bytes) -> bool:
+        if self.__directory is None or len(data) > self.__max_disk_bytes:
+            return False
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open_for_replace(path) as f:
+            f.write(data)
+        return True
@@ -0,0 +1,142 @@
+from functools import cache
+from glob import glob
+import json
+import os
+import numpy as np
+from PIL import Image
+from .constants import (
+    ASSETS_DIR,
+    MASK_COLOR,
+    LETTER_SAMPLE_MODE,
+    COLOR_BYTE_DEPTH,
+    SPRITE_ATLAS_FILE,
+    SPRITE_ATLAS_INDEX_FILE,
+    get_assets_digest,
+)
+from .masked_image import MaskedImage
+
+
+def load_png_sprites(name: str, size: tuple[int, int]) -> tuple[MaskedImage, ...]:
+    """
+    Decode all animation frames of a resource from the png assets.
+    """
+
+    # Sort so animation frames always come in the same order.
+    files = sorted(glob(os.path.join(ASSETS_DIR, f"{name}_*.png")))
+    images = []
+
+    for file in files:
+        image = np.array(
+            Image.open(file).convert("RGBA").resize(size, resample=LETTER_SAMPLE_MODE)
+        )
+        foreground_mask = np.any(image != MASK_COLOR, axis=2)
+        background_mask = np.all(image == MASK_COLOR, axis=2)
+        for array in (image, foreground_mask, background_mask):
+            array.setflags(write=False)
+        images.append(MaskedImage(name, file, image, foreground_mask, background_mask))
+
+    return tuple(images)
+
+
+class SpriteAtlas:
+    """
+    All sprites at their commonly used sizes packed into one memory mapped array.
+    Every sprite is stored as its RGBA image followed by its foreground
+    and background mask.
+    """
+
+    def __init__(self, data: np.ndarray, index: dict[str, list[list]]) -> None:
+        self.__data = data
+        self.__index = index
+
+    def get(self, name: str, size: tuple[int, int]) -> tuple[MaskedImage, ...] | None:
+        entries = self.__index.get(SpriteAtlas.__key(name, size))
+        if entries is None:
+            return None
+
+        width, height = size
+        pixel_count = width * height
+        images = []
+        for file, offset in entries:
+            image_end = offset + pixel_count * COLOR_BYTE_DEPTH
+            image = self.__data[offset:image_end].reshape(height, width, COLOR_BYTE_DEPTH)
+            foreground_mask = (
+                self.__data[image_end : image_end + pixel_count]
+                .view(np.bool_)
+                .reshape(height, width)
+            )
+            background_mask = (
+                self.__data[image_end + pixel_count : image_end + 2 * pixel_count]
+                .view(np.bool_)
+                .reshape(height, width)
+            )
+            images.append(
+                MaskedImage(
+                    name,
+                    os.path.join(ASSETS_DIR, file),
+                    image,
+                    foreground_mask,
+                    background_mask,
+                )
+            )
+
+        return tuple(images)
+
+    @staticmethod
+    def __key(name: str, size: tuple[int, int]) -> str:
+        return f"{name}:{size[0]}x{size[1]}"
+
+    @staticmethod
+    def load(
+        filename: str = SPRITE_ATLAS_FILE, index_filename: str = SPRITE_ATLAS_INDEX_FILE
+    ) -> "SpriteAtlas | None":
+        """
+        Memory map the atlas. Returns None if there is no atlas
+        or it was built from different assets.
+        """
+
+        try:
+            with open(index_filename) as f:
+                index = json.load(f)
+            if index["assets_digest"] != get_assets_digest():
+                return None
+            return SpriteAtlas(np.load(filename, mmap_mode="r"), index["sprites"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def build(
+        sizes: dict[str, list[tuple[int, int]]],
+        filename: str = SPRITE_ATLAS_FILE,
+        index_filename: str = SPRITE_ATLAS_INDEX_FILE,
+    ) -> None:
+        """
+        Pack the sprites of every resource at the given sizes into an atlas.
+        """
+
+        chunks = []
+        index: dict[str, list[list]] = {}
+        offset = 0
+
+        for name, name_sizes in sizes.items():
+            for size in name_sizes:
+                entries = index.setdefault(SpriteAtlas.__key(name, size), [])
+                for sprite in load_png_sprites(name, size):
+                    entries.append([os.path.basename(sprite.resource_uri), offset])
+                    for array in (
+                        sprite.image,
+                        sprite.foreground_mask,
+                        sprite.background_mask,
+                    ):
+                        chunk = np.ascontiguousarray(array).view(np.uint8).ravel()
+                        chunks.append(chunk)
+                        offset += chunk.size
+
+        np.save(filename, np.concatenate(chunks))
+        with open(index_filename, "w") as f:
+            json.dump({"assets_digest": get_assets_digest(), "sprites": index}, f)
+
+
+@cache
+def get_sprite_atlas() -> SpriteAtlas | None:
+    return SpriteAtlas.load()
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from .constants import SPRITE_CACHE_MAX_ENTRIES
+from .instrumentation import measure, count
+from .masked_image import MaskedImage
+from .sprite_atlas import get_sprite_atlas, load_png_sprites
+
+
+@dataclass
+class SpriteCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class SpriteCache:
+    """
+    Bounded LRU cache of decoded sprites keyed by (resource name, target size).
+    The cached images are never handed out directly, callers get copies they
+    are free to recolor while the (read only) masks are shared.
+    """
+
+    def __init__(self, max_entries: int = SPRITE_CACHE_MAX_ENTRIES) -> None:
+        assert max_entries > 0
+        self.__max_entries = max_entries
+        self.__entries: OrderedDict[
+            tuple[str, tuple[int, int]], tuple[MaskedImage, ...]
+        ] = OrderedDict()
+        self.__stats = SpriteCacheStats()
+
+    def get(self, name: str, size: tuple[int, int]) -> list[MaskedImage]:
+        key = (name, size)
+        templates = self.__entries.get(key)
+
+        if templates is None:
+            self.__stats.misses += 1
+            count("sprite_cache_misses_total")
+            with measure("sprite_load"):
+                templates = SpriteCache.__load_images(name, size)
+            self.__entries[key] = templates
+            if len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+                self.__stats.evictions += 1
+        else:
+            self.__stats.hits += 1
+            count("sprite_cache_hits_total")
+            self.__entries.move_to_end(key)
+
+        return [
+            MaskedImage(
+                t.resource_name,
+                t.resource_uri,
+                t.image.copy(),
+                t.foreground_mask,
+                t.background_mask,
+            )
+            for t in templates
+        ]
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.__stats = SpriteCacheStats()
+
+    @property
+    def stats(self) -> SpriteCacheStats:
+        return self.__stats
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @staticmethod
+    def __load_images(name: str, size: tuple[int, int]) -> tuple[MaskedImage, ...]:
+        # Prefer the packed atlas, the pngs are only decoded for sizes it lacks.
+        atlas = get_sprite_atlas()
+        if atlas is not None:
+            images = atlas.get(name, size)
+            if images is not None:
+                return images
+
+        return load_png_sprites(name, size)
+
+
+# Shared by all animated objects of this process.
+SPRITE_CACHE = SpriteCache()
@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable
+import json
+import os
+import threading
+import traceback
+from .animated_text import AnimatedText
+from .render_pool import RenderPool
+from .sprite_atlas import get_sprite_atlas
+from .word_tiles import WORD_TILE_CACHE
+from .constants import (
+    COLOR_PALETTE,
+    KNOWN_WORDS_TO_COLOR,
+    TRANSPARENT_COLOR,
+    OUTPUT_FORMAT_GIF,
+    OUTPUT_FORMATS,
+)
+
+
+@dataclass
+class TextJob:
+    text: str
+    output_file: str
+    solid: bool = False
+    seed: int | None = None
+    output_format: str = OUTPUT_FORMAT_GIF
+
+
+@dataclass
+class TextJobResult:
+    job: TextJob
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def parse_text_jobs(
+    lines: Iterable[str],
+    output_dir: str = ".",
+    solid: bool = False,
+    seed: int | None = None,
+    output_format: str = OUTPUT_FORMAT_GIF,
+    errors: list[TextJobResult] | None = None,
+) -> list[TextJob]:
+    """
+    Jobs are either JSON objects like {"text": "baba is You", "output": "baba.gif",
+    "solid": true, "seed": 1, "format": "gif"} or plain text lines, written to
+    <line number>.<format extension>. Relative outputs go to output_dir, solid,
+    seed and output_format are the defaults of jobs that do not set them.
+    Plain lines use \\n and \\t for layout like the cli.
+    Empty lines are skipped. Raises ValueError on malformed jobs, unless errors
+    is given: then every malformed line is added to it as a failed result.
+    """
+    jobs = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            jobs.append(
+                parse_text_job(line, number, output_dir, solid, seed, output_format)
+            )
+        except ValueError as e:
+            if errors is None:
+                raise
+            output_file = f"{number}.{OUTPUT_FORMATS[output_format]}"
+            job = TextJob(line, os.path.join(output_dir, output_file))
+            errors.append(TextJobResult(job, str(e)))
+    return jobs
+
+
+def parse_text_job(
+    line: str,
+    number: int,
+    output_dir: str = ".",
+    solid: bool = False,
+    seed: int | None = None,
+    output_format: str = OUTPUT_FORMAT_GIF,
+) -> TextJob:
+    """
+    Job of a single non empty line, see parse_text_jobs.
+    """
+    if not line.startswith("{"):
+        text = line.replace("\\n", "\n").replace("\\t", "\t")
+        output_file = f"{number}.{OUTPUT_FORMATS[output_format]}"
+        return TextJob(
+            text, os.path.join(output_dir, output_file), solid, seed, output_format
+        )
+
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Line {number}: {e}")
+    if not isinstance(job, dict) or not isinstance(job.get("text"), str):
+        raise ValueError(f'Line {number}: Job must be an object with a "text"')
+    job_format = job.get("format", output_format)
+    if not isinstance(job_format, str) or job_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Line {number}: Unknown format {job_format}")
+    output_file = job.get("output", f"{number}.{OUTPUT_FORMATS[job_format]}")
+    if not isinstance(output_file, str):
+        raise ValueError(f'Line {number}: "output" must be a string')
+    job_solid = job.get("solid", solid)
+    if not isinstance(job_solid, bool):
+        raise ValueError(f'Line {number}: "solid" must be true or false')
+    job_seed = job.get("seed", seed)
+    # bool is an int too, but true is no seed anyone means.
+    if job_seed is not None and (
+        not isinstance(job_seed, int) or isinstance(job_seed, bool)
+    ):
+        raise ValueError(f'Line {number}: "seed" must be an integer or null')
+    return TextJob(
+        job["text"],
+        os.path.join(output_dir, output_file),
+        job_solid,
+        job_seed,
+        job_format,
+    )
+
+
+def render_text_job(job: TextJob) -> None:
+    AnimatedText(
+        job.text,
+        background_color=COLOR_PALETTE["black"] if job.solid else TRANSPARENT_COLOR,
+        seed=job.seed,
+    ).write_to_file(job.output_file, job.output_format)
+
+
+def run_text_jobs(
+    jobs: list[TextJob],
+    worker_count: int = 1,
+    on_done: Callable[[TextJobResult], None] | None = None,
+) -> list[TextJobResult]:
+    """
+    Render all jobs in this process, or with more than one worker in a
+    RenderPool, sharing loaded sprites and word tiles between jobs either way.
+    A failing job does not stop the others, its error is part of its result.
+    on_done is called in this process whenever a job finishes, one call at a time.
+    """
+    assert worker_count > 0
+    lock = threading.Lock()
+
+    def run(render: Callable[[TextJob], None], job: TextJob) -> TextJobResult:
+        try:
+            render(job)
+            result = TextJobResult(job)
+        except Exception as e:
+            # Errors from workers carry the whole traceback, keep its last line.
+            error = "".join(traceback.format_exception_only(e))
+            result = TextJobResult(job, error.strip().splitlines()[-1])
+        if on_done is not None:
+            with lock:
+                on_done(result)
+        return result
+
+    if worker_count == 1 or len(jobs) <= 1:
+        return [run(render_text_job, job) for job in jobs]
+
+    # Load once here, the forked workers share it.
+    get_sprite_atlas()
+    WORD_TILE_CACHE.warm(KNOWN_WORDS_TO_COLOR)
+
+    with RenderPool(worker_count) as pool, ThreadPoolExecutor(worker_count) as executor:
+        render_in_pool = lambda job: pool.run(render_text_job, job)
+        return list(executor.map(lambda job: run(render_in_pool, job), jobs))
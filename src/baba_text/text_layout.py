@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+import numpy as np
+from .constants import SPRITE_SIZE, NEWLINE, TAB
+
+
+@dataclass
+class TextLayout:
+    """
+    Where the words of a text go, kept as one array per property instead of
+    one Rect per word, so laying out and drawing very long texts does not
+    create an object per word. Word i fills the cell_size square whose top left
+    corner is at (lefts[i], tops[i]).
+    """
+
+    lefts: np.ndarray
+    tops: np.ndarray
+    cell_size: int = SPRITE_SIZE
+
+    @staticmethod
+    def from_tokens(tokens: list[str], cell_size: int = SPRITE_SIZE) -> "TextLayout":
+        """
+        Words are placed on a grid left to right, a tab leaves a cell empty
+        and a newline starts the next row.
+        """
+        is_newline = np.array([token == NEWLINE for token in tokens], dtype=np.bool_)
+        is_tab = np.array([token == TAB for token in tokens], dtype=np.bool_)
+
+        rows = np.cumsum(is_newline)
+        # Every token but a newline takes one cell, columns count the cells
+        # taken since the last newline.
+        cells_taken = np.cumsum(~is_newline)
+        last_newline = np.maximum.accumulate(
+            np.where(is_newline, np.arange(len(tokens)), -1)
+        )
+        columns = (
+            cells_taken
+            - 1
+            - np.where(last_newline >= 0, cells_taken[last_newline], 0)
+        )
+
+        is_word = ~(is_newline | is_tab)
+        return TextLayout(
+            columns[is_word] * cell_size, rows[is_word] * cell_size, cell_size
+        )
+
+    def __len__(self) -> int:
+        return len(self.lefts)
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """
+        Width and height of the smallest image holding all words.
+        """
+        return (
+            int(self.lefts.max()) + self.cell_size,
+            int(self.tops.max()) + self.cell_size,
+        )
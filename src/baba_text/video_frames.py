@@ -0,0 +1,18 @@
+from typing import BinaryIO, Iterator
+import numpy as np
+from .constants import ANIMATION_FPS
+
+
+def iter_video_frames(source: str | BinaryIO) -> Iterator[tuple[np.ndarray, float]]:
+    """
+    Decode a video (mp4, webm, ...) frame by frame with imageio, yields
+    (image, duration in ms). Only the current frame is kept in memory.
+    Most video formats need an imageio video plugin installed, e.g. av.
+    """
+    # Imported here, most inputs are images and imageio takes a while to load.
+    import imageio.v3 as iio
+
+    with iio.imopen(source, "r") as video:
+        fps = video.metadata().get("fps") or ANIMATION_FPS
+        for frame in video.iter():
+            yield frame, 1000 / fps
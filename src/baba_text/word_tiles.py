@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable
+import random
+import numpy as np
+from .animated_word import AnimatedWord
+from .color import Color
+from .rect import Rect
+from .instrumentation import measure, count
+from .constants import (
+    SPRITE_SIZE,
+    ANIMATION_FRAME_COUNT,
+    WORD_TILE_CACHE_MAX_ENTRIES,
+    WORD_TILE_VARIANTS,
+)
+
+# Pixel labels of a word tile, looked up in (background, sprite, text) colors.
+LABEL_BACKGROUND = 0
+LABEL_SPRITE = 1
+LABEL_TEXT = 2
+
+# Stand-in colors the labels are drawn with, they only have to be distinct.
+LABEL_COLORS = {
+    Color(LABEL_BACKGROUND, 0, 0): LABEL_BACKGROUND,
+    Color(LABEL_SPRITE, 0, 0): LABEL_SPRITE,
+    Color(LABEL_TEXT, 0, 0): LABEL_TEXT,
+}
+
+
+@dataclass
+class WordTileCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class WordTileCache:
+    """
+    Bounded LRU cache of fully composited words (background sprite and letters)
+    for every animation frame, keyed by (word, variant).
+
+    Tiles do not hold colors but a label per pixel (LABEL_BACKGROUND, LABEL_SPRITE
+    or LABEL_TEXT), so one tile serves a word in every color combination.
+    A word comes in WORD_TILE_VARIANTS variants, each animated with its own
+    fixed seed, so the same word appearing twice does not have to move in sync.
+    """
+
+    def __init__(self, max_entries: int = WORD_TILE_CACHE_MAX_ENTRIES) -> None:
+        assert max_entries > 0
+        self.__max_entries = max_entries
+        self.__entries: OrderedDict[tuple[str, int], np.ndarray] = OrderedDict()
+        self.__stats = WordTileCacheStats()
+
+    def get(self, word: str, variant: int) -> np.ndarray:
+        """
+        Read only (ANIMATION_FRAME_COUNT, SPRITE_SIZE, SPRITE_SIZE) array of labels.
+        """
+        key = (word, variant)
+        tiles = self.__entries.get(key)
+
+        if tiles is None:
+            self.__stats.misses += 1
+            count("word_tile_cache_misses_total")
+            with measure("word_tile_render"):
+                tiles = WordTileCache.__render(word, variant)
+            self.__entries[key] = tiles
+            if len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+                self.__stats.evictions += 1
+        else:
+            self.__stats.hits += 1
+            count("word_tile_cache_hits_total")
+            self.__entries.move_to_end(key)
+
+        return tiles
+
+    def warm(self, words: Iterable[str]) -> None:
+        """
+        Render all variants of words ahead of time, e.g. at startup.
+        """
+        for word in words:
+            for variant in range(WORD_TILE_VARIANTS):
+                self.get(word, variant)
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.__stats = WordTileCacheStats()
+
+    @property
+    def stats(self) -> WordTileCacheStats:
+        return self.__stats
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @staticmethod
+    def get_variant_rng(word: str, variant: int) -> random.Random:
+        """
+        Generator the animation of a word variant is made with.
+        """
+        return random.Random(f"{word}:{variant}")
+
+    @staticmethod
+    def __render(word: str, variant: int) -> np.ndarray:
+        colors = list(LABEL_COLORS)
+        animated_word = AnimatedWord(
+            word,
+            Rect(0, 0, SPRITE_SIZE, SPRITE_SIZE),
+            colors[LABEL_TEXT],
+            colors[LABEL_SPRITE],
+            colors[LABEL_BACKGROUND],
+            WordTileCache.get_variant_rng(word, variant),
+        )
+
+        tiles = np.empty((ANIMATION_FRAME_COUNT, SPRITE_SIZE, SPRITE_SIZE), np.uint8)
+        for tile in tiles:
+            animated_word.draw_indices(tile, LABEL_COLORS)
+            animated_word.advance_animation()
+
+        tiles.setflags(write=False)
+        return tiles
+
+
+# Shared by all texts of this process.
+WORD_TILE_CACHE = WordTileCache()
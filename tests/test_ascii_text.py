@@ -2,6 +2,8 @@ import unittest
 import os
 from io import BytesIO
 
+import numpy as np
+
 from baba_text.animated_text import AnimatedText
 from baba_text.animated_ascii_art import AnimatedAsciiArt
 from PIL import Image
@@ -28,3 +30,109 @@ class TestAsciiText(unittest.TestCase):
         AnimatedAsciiArt(gif, 5).write_to_gif(
             os.path.join(OUTPUT_DIR, "ascii_art_dynamic.gif")
         )
+
+    def test_resampled_ascii(self):
+        source = BytesIO()
+        frames = [Image.new("RGBA", (10, 10), (i * 20, 0, 0, 255)) for i in range(10)]
+        frames[0].save(
+            source, format="gif", save_all=True, append_images=frames[1:], duration=50
+        )
+        source.seek(0)
+
+        result = Image.open(AnimatedAsciiArt(source, 5, target_fps=4).write_to_buffer())
+        durations = []
+        for n in range(result.n_frames):
+            result.seek(n)
+            durations.append(result.info["duration"])
+
+        self.assertEqual(durations, [250, 250])
+
+    def test_frame_stride_and_time_window_ascii(self):
+        source = BytesIO()
+        frames = [Image.new("RGBA", (10, 10), (i * 20, 0, 0, 255)) for i in range(10)]
+        frames[0].save(
+            source, format="gif", save_all=True, append_images=frames[1:], duration=50
+        )
+        source.seek(0)
+
+        art = AnimatedAsciiArt(
+            source, 5, frame_stride=2, start_time=0.1, end_time=0.4
+        ).write_to_buffer()
+        result = Image.open(art)
+        durations = []
+        for n in range(result.n_frames):
+            result.seek(n)
+            durations.append(result.info["duration"])
+
+        self.assertEqual(durations, [100, 100, 100])
+
+        source.seek(0)
+        with self.assertRaises(ValueError):
+            AnimatedAsciiArt(source, 5, start_time=10).write_to_buffer()
+
+    def test_render_frames_into_buffer(self):
+        text = AnimatedText("baba is You", seed=0)
+        frames = np.zeros(text.frames_shape, dtype=np.uint8)
+        self.assertIs(text.render_frames(out=frames), frames)
+        for a, b in zip(frames, AnimatedText("baba is You", seed=0).iter_frames()):
+            np.testing.assert_array_equal(a, b)
+        self.assertEqual(memoryview(frames).shape, text.frames_shape)
+
+        gif = text.write_to_buffer()
+        sequential = AnimatedAsciiArt(gif, 5, seed=1).render_frames()
+        buffer = np.zeros((len(sequential) + 2,) + sequential.shape[1:], np.uint8)
+        gif.seek(0)
+        frames = AnimatedAsciiArt(gif, 5, seed=1).render_frames(out=buffer)
+        self.assertTrue(np.shares_memory(frames, buffer))
+        np.testing.assert_array_equal(frames, sequential)
+
+        for wrong in (
+            buffer[:1],
+            buffer.astype(np.int16),
+            np.repeat(buffer, 2, axis=0)[::2],
+        ):
+            gif.seek(0)
+            with self.assertRaises(ValueError):
+                AnimatedAsciiArt(gif, 5).render_frames(out=wrong)
+
+        for wrong in (
+            np.zeros(text.frames_shape[1:], np.uint8),
+            np.zeros(text.frames_shape, np.float32),
+            np.zeros(text.frames_shape, np.uint8, order="F"),
+        ):
+            with self.assertRaises(ValueError):
+                text.render_frames(out=wrong)
+
+    def test_failed_write_keeps_existing_file(self):
+        path = os.path.join(OUTPUT_DIR, "keep.gif")
+        with open(path, "wb") as f:
+            f.write(b"old")
+
+        with self.assertRaises(ValueError):
+            AnimatedText("A").write_to_file(path, "unknown")
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"old")
+        self.assertFalse([n for n in os.listdir(OUTPUT_DIR) if n.endswith(".tmp")])
+
+    def test_max_frames_ascii(self):
+        gif = AnimatedText("A").write_to_buffer()
+        frames = AnimatedAsciiArt(gif, 5, max_frames=2).write_raw_frames()
+        self.assertEqual(len(frames), 2)
+
+    def test_reject_large_ascii(self):
+        gif = AnimatedText("A").write_to_buffer()
+        with self.assertRaises(ValueError):
+            AnimatedAsciiArt(gif, 5, max_input_frames=2)
+        gif.seek(0)
+        with self.assertRaises(ValueError):
+            AnimatedAsciiArt(gif, 5, max_input_pixels=100)
+
+    def test_seeded_ascii_is_reproducible(self):
+        gif = AnimatedText("AE", seed=1).write_to_buffer().getvalue()
+        self.assertEqual(gif, AnimatedText("AE", seed=1).write_to_buffer().getvalue())
+
+        art = AnimatedAsciiArt(BytesIO(gif), 5, greyscale=True, seed=1)
+        self.assertEqual(
+            art.write_to_buffer().getvalue(), art.write_to_buffer().getvalue()
+        )
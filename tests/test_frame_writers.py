@@ -0,0 +1,62 @@
+import json
+import unittest
+
+import numpy as np
+from baba_text.animated_text import AnimatedText
+from baba_text.animated_ascii_art import AnimatedAsciiArt
+from baba_text.constants import (
+    ANIMATION_FRAME_COUNT,
+    OUTPUT_FORMAT_APNG,
+    OUTPUT_FORMAT_SPRITE_SHEET,
+    OUTPUT_FORMAT_WEBP,
+    OUTPUT_FORMAT_WEBP_LOSSY,
+    SPRITE_SHEET_METADATA_KEY,
+)
+from PIL import Image
+
+
+def read_frames(buffer) -> list[np.ndarray]:
+    image = Image.open(buffer)
+    frames = []
+    for n in range(image.n_frames):
+        image.seek(n)
+        frames.append(np.array(image.convert("RGBA")))
+    return frames
+
+
+class TestFrameWriters(unittest.TestCase):
+    def test_lossless_formats_keep_frames(self):
+        text = AnimatedText("baba is You", seed=0)
+        expected = text.write_raw_frames()
+        for output_format in (OUTPUT_FORMAT_WEBP, OUTPUT_FORMAT_APNG):
+            frames = read_frames(text.write_to_buffer(output_format))
+            self.assertEqual(len(frames), ANIMATION_FRAME_COUNT, output_format)
+            for frame, expected_frame in zip(frames, expected):
+                # Fully transparent pixels may come back with any color.
+                visible = expected_frame[:, :, 3] != 0
+                np.testing.assert_array_equal(
+                    frame[visible], expected_frame[visible], output_format
+                )
+
+    def test_lossy_webp(self):
+        gif = AnimatedText("baba").write_to_buffer()
+        art = AnimatedAsciiArt(gif, 5, seed=0)
+        frames = read_frames(art.write_to_buffer(OUTPUT_FORMAT_WEBP_LOSSY))
+        self.assertEqual(frames[0].shape, art.write_raw_frames()[0].shape)
+
+    def test_sprite_sheet(self):
+        text = AnimatedText("keke", seed=0)
+        expected = text.write_raw_frames()
+        sheet = Image.open(text.write_to_buffer(OUTPUT_FORMAT_SPRITE_SHEET))
+        metadata = json.loads(sheet.info[SPRITE_SHEET_METADATA_KEY])
+
+        self.assertEqual(metadata["frame_count"], ANIMATION_FRAME_COUNT)
+        self.assertEqual(len(metadata["durations"]), ANIMATION_FRAME_COUNT)
+        width, height = metadata["frame_width"], metadata["frame_height"]
+        pixels = np.array(sheet)
+        for i, expected_frame in enumerate(expected):
+            row, column = divmod(i, metadata["columns"])
+            frame = pixels[
+                row * height : (row + 1) * height, column * width : (column + 1) * width
+            ]
+            np.testing.assert_array_equal(frame, expected_frame)
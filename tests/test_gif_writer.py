@@ -0,0 +1,115 @@
+import unittest
+from io import BytesIO
+import numpy as np
+from PIL import Image, ImageSequence
+
+from baba_text.animated_text import AnimatedText
+from baba_text.gif_writer import GifWriter
+from baba_text.color import Color
+from baba_text.constants import GIF_DISPOSAL_MODE_TRANSPARENT, GIF_DISPOSAL_MODE_SOLID
+
+
+class TestGifWriter(unittest.TestCase):
+    def __assert_round_trip(
+        self,
+        frames: list[np.ndarray],
+        disposal: int,
+        palette: list[Color] | None = None,
+    ):
+        buffer = BytesIO()
+        with GifWriter(buffer, disposal=disposal, palette=palette) as writer:
+            for frame in frames:
+                writer.write_frame(frame, 250)
+        buffer.seek(0)
+        if palette is not None:
+            frames = [np.array(palette, dtype=np.uint8)[frame] for frame in frames]
+
+        decoded = [
+            np.array(frame.convert("RGBA"))
+            for frame in ImageSequence.Iterator(Image.open(buffer))
+        ]
+        self.assertEqual(len(decoded), len(frames))
+        for frame, decoded_frame in zip(frames, decoded):
+            visible = frame[:, :, 3] > 0
+            self.assertTrue((frame[visible] == decoded_frame[visible]).all())
+            self.assertTrue((decoded_frame[~visible][:, 3] == 0).all())
+
+    def test_transparent_round_trip(self):
+        self.__assert_round_trip(
+            AnimatedText("baba is You").write_raw_frames(),
+            GIF_DISPOSAL_MODE_TRANSPARENT,
+        )
+
+    def test_solid_round_trip(self):
+        self.__assert_round_trip(
+            AnimatedText("baba is You", Color(0, 0, 0)).write_raw_frames(),
+            GIF_DISPOSAL_MODE_SOLID,
+        )
+
+    def test_indexed_frames_match_rgba_frames(self):
+        rgba_frames = AnimatedText("baba is You\nkeke", seed=0).write_raw_frames()
+        text = AnimatedText("baba is You\nkeke", seed=0)
+        palette = np.array(text.palette, dtype=np.uint8)
+
+        for indices, frame in zip(text.iter_indexed_frames(), rgba_frames):
+            self.assertTrue((palette[indices] == frame).all())
+
+    def test_palette_round_trip(self):
+        frames = AnimatedText("baba is You", Color(0, 0, 0), seed=0).write_raw_frames()
+        result = Image.open(
+            AnimatedText("baba is You", Color(0, 0, 0), seed=0).write_to_buffer()
+        )
+
+        for frame, decoded in zip(frames, ImageSequence.Iterator(result)):
+            self.assertTrue((np.array(decoded.convert("RGBA")) == frame).all())
+
+    def test_identical_frames_are_merged(self):
+        frame = AnimatedText("baba").write_raw_frames()[0]
+        buffer = BytesIO()
+        with GifWriter(buffer, disposal=GIF_DISPOSAL_MODE_TRANSPARENT) as writer:
+            writer.write_frame(frame, 250)
+            writer.write_frame(frame.copy(), 250)
+        buffer.seek(0)
+
+        result = Image.open(buffer)
+        self.assertEqual(result.n_frames, 1)
+        self.assertEqual(result.info["duration"], 500)
+
+    def test_optimized_is_smaller(self):
+        frames = AnimatedText("baba is You").write_raw_frames()
+        sizes = []
+        for optimize in (False, True):
+            buffer = BytesIO()
+            with GifWriter(
+                buffer, disposal=GIF_DISPOSAL_MODE_TRANSPARENT, optimize=optimize
+            ) as writer:
+                for frame in frames:
+                    writer.write_frame(frame, 250)
+            sizes.append(buffer.tell())
+
+        self.assertLess(sizes[1], sizes[0])
+
+    def test_sparse_changes_round_trip(self):
+        # Only some pixels change between frames, so frames are written in boxes
+        # smaller than the image, while disposing clears pixels outside of them.
+        palette = [Color(0, 0, 0, 0), Color(255, 0, 0), Color(0, 255, 0)]
+        cases = [[np.array([[2], [2]]), np.array([[0], [2]]), np.array([[1], [1]])]]
+
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            frames = [rng.integers(0, len(palette), (4, 4))]
+            while len(frames) < 5:
+                frame = frames[-1].copy()
+                changed = rng.random(frame.shape) < 0.3
+                frame[changed] = rng.integers(0, len(palette), changed.sum())
+                if (frame != frames[-1]).any():
+                    frames.append(frame)
+            cases.append(frames)
+
+        for frames in cases:
+            frames = [frame.astype(np.uint8) for frame in frames]
+            self.__assert_round_trip(frames, GIF_DISPOSAL_MODE_TRANSPARENT, palette)
+            self.__assert_round_trip(
+                [np.array(palette, dtype=np.uint8)[frame] for frame in frames],
+                GIF_DISPOSAL_MODE_TRANSPARENT,
+            )
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+
+from baba_text.glyph_tiles import GlyphTiles
+from baba_text.animated_letter import AnimatedLetter
+from baba_text.rect import Rect
+from baba_text.constants import (
+    COLOR_PALETTE,
+    TRANSPARENT_COLOR,
+    RESOURCE_LETTER_WIDTH,
+    RESOURCE_LETTER_HEIGHT,
+    SPACE,
+)
+
+
+class TestGlyphTiles(unittest.TestCase):
+    def test_compose_matches_drawing_letters(self):
+        characters = "AE. "
+        tiles = GlyphTiles.from_characters(
+            characters, COLOR_PALETTE["grey"], TRANSPARENT_COLOR
+        )
+        glyphs = np.array([[0, 1, 2], [3, 1, 0]])
+        animation_states = np.array([[0, 3, 1], [0, 2, 2]])
+
+        colors = np.random.randint(0, 256, size=glyphs.shape + (4,), dtype=np.uint8)
+        screen = tiles.compose(glyphs, animation_states)
+        colored_screen = tiles.compose(glyphs, animation_states, colors)
+
+        expected = np.zeros_like(screen)
+        colored_expected = np.zeros_like(screen)
+        for x in range(glyphs.shape[0]):
+            for y in range(glyphs.shape[1]):
+                character = characters[glyphs[x, y]]
+                if character == SPACE:
+                    continue
+                letter = AnimatedLetter(
+                    character,
+                    Rect(
+                        y * RESOURCE_LETTER_HEIGHT,
+                        x * RESOURCE_LETTER_HEIGHT,
+                        RESOURCE_LETTER_WIDTH,
+                        RESOURCE_LETTER_HEIGHT,
+                    ),
+                    COLOR_PALETTE["grey"],
+                    TRANSPARENT_COLOR,
+                )
+                letter.animation_index = animation_states[x, y]
+                letter.draw(expected)
+                letter.foreground_color = colors[x, y]
+                letter.draw(colored_expected)
+
+        self.assertTrue((screen == expected).all())
+        self.assertTrue((colored_screen == colored_expected).all())
+
+        out = np.empty_like(colored_screen)
+        self.assertIs(tiles.compose(glyphs, animation_states, colors, out=out), out)
+        self.assertTrue((out == colored_expected).all())
+
+    def test_tint(self):
+        palette = [COLOR_PALETTE["red"], COLOR_PALETTE["blue"]]
+        tiles = GlyphTiles.from_characters(
+            "AB", COLOR_PALETTE["grey"], TRANSPARENT_COLOR
+        )
+        tinted = tiles.tint(palette)
+        glyphs = np.array([[0, 1]])
+        animation_states = np.array([[1, 2]])
+        colors = np.array([[palette[1], palette[1]]], dtype=np.uint8)
+
+        self.assertEqual(tinted.glyph_count, 4)
+        self.assertTrue(
+            (
+                tinted.compose(glyphs + tiles.glyph_count, animation_states)
+                == tiles.compose(glyphs, animation_states, colors)
+            ).all()
+        )
+
+    def test_advance_animation_stays_in_range(self):
+        tiles = GlyphTiles.from_characters(
+            "AE ", COLOR_PALETTE["grey"], TRANSPARENT_COLOR
+        )
+        glyphs = np.array([[0, 1, 2]])
+        animation_states = np.array([[2, 3, 0]])
+        rng = np.random.default_rng(0)
+
+        for _ in range(10):
+            animation_states = tiles.advance_animation(glyphs, animation_states, rng)
+            self.assertTrue((animation_states < [[3, 4, 1]]).all())
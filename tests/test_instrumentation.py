@@ -0,0 +1,33 @@
+import unittest
+from io import BytesIO
+
+from baba_text.animated_text import AnimatedText
+from baba_text.animated_ascii_art import AnimatedAsciiArt
+from baba_text.instrumentation import Metrics, collect_metrics, get_metrics
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_stages_are_recorded(self):
+        with collect_metrics() as metrics:
+            gif = AnimatedText("baba is You").write_to_buffer()
+            AnimatedAsciiArt(gif, 5, greyscale=True).write_to_buffer()
+
+        for stage in ("text_layout", "text_composite", "ascii_composite", "gif_encode"):
+            self.assertIn(stage, metrics.stage_counts)
+        self.assertEqual(metrics.counters["text_frames_total"], 6)
+        self.assertGreater(metrics.counters["ascii_cells_total"], 0)
+        self.assertIsNone(get_metrics())
+
+    def test_merge_and_export(self):
+        a = Metrics()
+        a.add("frames_total", 2)
+        a.observe("encode", 0.5)
+        b = Metrics()
+        b.add("frames_total", 3)
+        b.observe("encode", 0.25)
+        a.merge(b)
+
+        text = a.to_prometheus()
+        self.assertIn('baba_text_stage_seconds_count{stage="encode"} 2', text)
+        self.assertIn('baba_text_stage_seconds_sum{stage="encode"} 0.75', text)
+        self.assertIn("baba_text_frames_total 5", text)
@@ -2,6 +2,7 @@ import unittest
 import os
 
 from baba_text.animated_text import AnimatedText
+from baba_text.text_layout import TextLayout
 
 OUTPUT_DIR = "../output"
 
@@ -25,3 +26,13 @@ class TestLayout(unittest.TestCase):
         AnimatedText(
             "\n\t\tkeke\t\t\trock\n\t\tis\t\t\tis\n\t\tnot\t\t\tSink\nbaba is You\t\t\tand\n\t\t\t\t\t\tWin"
         ).write_to_gif(os.path.join(OUTPUT_DIR, "layout.gif"))
+
+    def test_layout_positions(self):
+        layout = TextLayout.from_tokens(
+            ["\t", "baba", "is", "\n", "You", "\t", "\t", "Win", "\n", "\n", "keke"],
+            cell_size=10,
+        )
+        self.assertEqual(layout.lefts.tolist(), [10, 20, 0, 30, 0])
+        self.assertEqual(layout.tops.tolist(), [0, 0, 10, 10, 30])
+        self.assertEqual(layout.size, (40, 40))
+        self.assertEqual(len(layout), 5)
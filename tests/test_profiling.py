@@ -0,0 +1,25 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+from baba_text.animated_text import AnimatedText
+from baba_text.profiling import STAGE_GROUPS, run_profiled
+
+
+class TestProfiling(unittest.TestCase):
+    def test_repeat_and_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profile_file = os.path.join(directory, "render.prof")
+            report = run_profiled(
+                lambda: AnimatedText("baba is You", seed=0).write_to_buffer(),
+                repeat=3,
+                profile_file=profile_file,
+            )
+            self.assertGreater(pstats.Stats(profile_file).total_calls, 0)
+
+        self.assertEqual(len(report.durations), 3)
+        self.assertGreater(sum(report.get_group_seconds("encode")), 0)
+        text = report.format()
+        for group in STAGE_GROUPS:
+            self.assertIn(group, text)
@@ -0,0 +1,117 @@
+import unittest
+import asyncio
+import os
+import signal
+import threading
+import time
+from unittest import mock
+
+from baba_text.render_pool import RenderPool, REPLACEMENT_START_METHOD
+
+
+def get_pid() -> int:
+    return os.getpid()
+
+
+def get_parent_pid() -> int:
+    return os.getppid()
+
+
+def fail() -> None:
+    raise ValueError("baba is broken")
+
+
+def crash() -> None:
+    os._exit(1)
+
+
+def sleep_and_get_pid(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+class TestRenderPool(unittest.TestCase):
+    def test_workers_are_reused(self):
+        with RenderPool(1) as pool:
+            self.assertEqual(pool.run(get_pid), pool.run(get_pid))
+            self.assertNotEqual(pool.run(get_pid), os.getpid())
+
+    def test_workers_are_recycled(self):
+        with RenderPool(1, max_jobs_per_worker=2) as pool:
+            pids = [pool.run(get_pid) for _ in range(4)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+        self.assertEqual(pids[2], pids[3])
+
+    @unittest.skipUnless(REPLACEMENT_START_METHOD, "Needs a fork server")
+    def test_replacements_do_not_fork_from_pool(self):
+        # The pool process already runs threads, replacements must not fork from it.
+        with RenderPool(1, max_jobs_per_worker=1) as pool:
+            self.assertEqual(pool.run(get_parent_pid), os.getpid())
+            self.assertNotEqual(pool.run(get_parent_pid), os.getpid())
+
+    def test_errors_are_reported(self):
+        with RenderPool(1) as pool:
+            with self.assertRaisesRegex(RuntimeError, "baba is broken"):
+                pool.run(fail)
+            self.assertEqual(pool.run(sum, [1, 2]), 3)
+
+    def test_crashed_worker_is_replaced(self):
+        with RenderPool(1) as pool:
+            with self.assertRaises(RuntimeError):
+                pool.run(crash)
+            self.assertEqual(pool.run(sum, [1, 2]), 3)
+
+    def test_dead_idle_worker_is_replaced(self):
+        with RenderPool(1) as pool:
+            pid = pool.run(get_pid)
+            os.kill(pid, signal.SIGKILL)
+            time.sleep(0.1)
+            with self.assertRaises(RuntimeError):
+                pool.run(get_pid)
+            self.assertNotEqual(pool.run(get_pid), pid)
+
+    def test_timeout_kills_job(self):
+        with RenderPool(1) as pool:
+            pid = pool.run(get_pid)
+            with self.assertRaises(TimeoutError):
+                pool.run(time.sleep, 10, timeout=0.1)
+            self.assertNotEqual(pool.run(get_pid), pid)
+            with self.assertRaises(ProcessLookupError):
+                os.kill(pid, 0)
+
+    def test_async_jobs_run_concurrently(self):
+        async def run_all(pool: RenderPool) -> list:
+            return await asyncio.gather(
+                pool.run_async(time.sleep, 0.5), pool.run_async(time.sleep, 0.5)
+            )
+
+        with RenderPool(2) as pool:
+            start = time.monotonic()
+            asyncio.run(run_all(pool))
+            self.assertLess(time.monotonic() - start, 0.9)
+
+    def test_close_stops_workers_of_running_jobs(self):
+        pool = RenderPool(1)
+        pids = []
+        job = threading.Thread(
+            target=lambda: pids.append(pool.run(sleep_and_get_pid, 0.3))
+        )
+        job.start()
+        time.sleep(0.1)
+        pool.close()
+        job.join()
+
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pids[0], 0)
+
+    def test_failed_replacement_keeps_job_error(self):
+        with RenderPool(1) as pool:
+            with mock.patch(
+                "baba_text.render_pool.RenderWorker", side_effect=OSError("no fork")
+            ):
+                with self.assertRaisesRegex(RuntimeError, "died"):
+                    pool.run(crash)
+                with self.assertRaises(OSError):
+                    pool.run(get_pid)
+            self.assertEqual(pool.run(sum, [1, 2]), 3)
@@ -0,0 +1,98 @@
+import unittest
+import asyncio
+import time
+
+from baba_text.render_pool import RenderPool
+from baba_text.render_scheduler import (
+    RenderScheduler,
+    RenderRejectedError,
+    TokenBucket,
+)
+from baba_text.constants import RENDER_PRIORITY_CHEAP, RENDER_PRIORITY_EXPENSIVE
+
+
+def echo(value: str) -> str:
+    return value
+
+
+class TestRenderScheduler(unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=1, capacity=2, now=0)
+        self.assertTrue(bucket.try_take(0))
+        self.assertTrue(bucket.try_take(0))
+        self.assertFalse(bucket.try_take(0.5))
+        self.assertTrue(bucket.try_take(1))
+        self.assertFalse(bucket.is_full(1))
+        self.assertTrue(bucket.is_full(10))
+
+    def test_priority_and_fairness(self):
+        async def run_all(scheduler: RenderScheduler) -> list[str]:
+            order = []
+
+            async def submit(value: str, guild: str, priority: int) -> None:
+                order.append(
+                    await scheduler.submit(
+                        echo, value, guild=guild, user=value, priority=priority
+                    )
+                )
+
+            # Keeps the only worker busy while the others queue up.
+            blocker = asyncio.ensure_future(
+                scheduler.submit(time.sleep, 0.2, guild="c", user="c")
+            )
+            await asyncio.sleep(0)
+            await asyncio.gather(
+                submit("a draw", "a", RENDER_PRIORITY_EXPENSIVE),
+                submit("a say 1", "a", RENDER_PRIORITY_CHEAP),
+                submit("a say 2", "a", RENDER_PRIORITY_CHEAP),
+                submit("b say", "b", RENDER_PRIORITY_CHEAP),
+                blocker,
+            )
+            return order
+
+        with RenderPool(1) as pool:
+            scheduler = RenderScheduler(pool, 1, 10, 100, 100, 100, 100)
+            order = asyncio.run(run_all(scheduler))
+
+        self.assertEqual(order, ["a say 1", "b say", "a say 2", "a draw"])
+        self.assertEqual(scheduler.stats.completed, 5)
+        self.assertEqual(scheduler.queue_depth, 0)
+        self.assertGreater(scheduler.stats.max_wait_seconds, 0.1)
+
+    def test_admission(self):
+        async def run_all(scheduler: RenderScheduler) -> list:
+            return await asyncio.gather(
+                scheduler.submit(time.sleep, 0.1, guild="a", user="a"),
+                scheduler.submit(echo, "queued", guild="b", user="b"),
+                scheduler.submit(echo, "queue full", guild="c", user="c"),
+                return_exceptions=True,
+            )
+
+        with RenderPool(1) as pool:
+            scheduler = RenderScheduler(pool, 1, 1, 100, 100, 100, 100)
+            results = asyncio.run(run_all(scheduler))
+            self.assertEqual(results[1], "queued")
+            self.assertIsInstance(results[2], RenderRejectedError)
+
+            scheduler = RenderScheduler(pool, 1, 10, 100, 100, 1, 1)
+            results = asyncio.run(run_all(scheduler))
+            self.assertEqual(results[1:], ["queued", "queue full"])
+
+            # The same user again right away is over its limit.
+            with self.assertRaises(RenderRejectedError):
+                asyncio.run(scheduler.submit(echo, "again", guild="b", user="b"))
+        self.assertEqual(scheduler.stats.rejected_rate_limited, 1)
+
+    def test_rejected_user_keeps_guild_tokens(self):
+        with RenderPool(1) as pool:
+            scheduler = RenderScheduler(pool, 1, 10, 0.001, 2, 0.001, 1)
+            self.assertEqual(
+                asyncio.run(scheduler.submit(echo, "1", guild="a", user="u")), "1"
+            )
+            for _ in range(3):
+                with self.assertRaises(RenderRejectedError):
+                    asyncio.run(scheduler.submit(echo, "2", guild="a", user="u"))
+            # The guild still has the token the rejected requests did not use.
+            self.assertEqual(
+                asyncio.run(scheduler.submit(echo, "3", guild="a", user="v")), "3"
+            )
@@ -0,0 +1,91 @@
+import os
+import unittest
+import tempfile
+from io import BytesIO
+
+from baba_text.result_cache import ResultCache
+from baba_text.animated_text import AnimatedText
+from baba_text.animated_ascii_art import AnimatedAsciiArt
+from baba_text.color import Color
+
+
+class TestResultCache(unittest.TestCase):
+    def test_repeated_render_hits(self):
+        cache = ResultCache()
+        key = AnimatedText.get_cache_key("baba is You")
+        renders = []
+
+        def render() -> BytesIO:
+            renders.append(None)
+            return AnimatedText("baba is You").write_to_buffer()
+
+        first = cache.get_or_render(key, render)
+        second = cache.get_or_render(key, render)
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(first.getvalue(), second.getvalue())
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.misses, 1)
+        self.assertEqual(cache.stats.hit_rate, 0.5)
+
+    def test_keys_depend_on_options(self):
+        self.assertNotEqual(
+            AnimatedText.get_cache_key("baba"),
+            AnimatedText.get_cache_key("baba", Color(0, 0, 0)),
+        )
+        self.assertNotEqual(
+            AnimatedAsciiArt.get_cache_key(b"image"),
+            AnimatedAsciiArt.get_cache_key(b"image", greyscale=True),
+        )
+        self.assertNotEqual(
+            AnimatedAsciiArt.get_cache_key(b"image"),
+            AnimatedAsciiArt.get_cache_key(b"other image"),
+        )
+
+    def test_byte_budget(self):
+        cache = ResultCache(max_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"12345")
+        cache.put("too large", b"12345678901")
+
+        self.assertEqual(cache.size_bytes, 10)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNone(cache.get("too large"))
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ResultCache(directory=directory).put("key", b"gif")
+            restarted = ResultCache(directory=directory)
+
+            result = restarted.get("key")
+            assert result is not None
+            self.assertEqual(result.getvalue(), b"gif")
+            self.assertEqual(restarted.stats.disk_hits, 1)
+            self.assertEqual(len(restarted), 1)
+
+    def test_disk_byte_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(max_bytes=100, directory=directory, max_disk_bytes=10)
+            cache.put("a1", b"12345")
+            cache.put("b1", b"12345")
+            cache.clear()
+            cache.get("a1")
+            cache.put("c1", b"12345")
+            cache.put("too large", b"12345678901")
+
+            self.assertEqual(cache.disk_size_bytes, 10)
+            self.assertEqual(cache.stats.disk_evictions, 1)
+            path = lambda key: os.path.join(directory, key[:2], key)
+            self.assertTrue(os.path.exists(path("a1")))
+            self.assertFalse(os.path.exists(path("b1")))
+            self.assertFalse(os.path.exists(path("too large")))
+
+            # Restarting with a smaller budget drops the least recently used files.
+            restarted = ResultCache(directory=directory, max_disk_bytes=5)
+            self.assertEqual(restarted.disk_size_bytes, 5)
+            self.assertIsNone(restarted.get("a1"))
+            self.assertIsNotNone(restarted.get("c1"))
@@ -0,0 +1,31 @@
+import unittest
+import os
+import tempfile
+
+from baba_text.sprite_atlas import SpriteAtlas, load_png_sprites
+
+
+class TestSpriteAtlas(unittest.TestCase):
+    def test_atlas_matches_pngs(self):
+        sizes = {"A": [(20, 25), (44, 55)], "sprite": [(100, 100)]}
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "atlas.npy")
+            index_filename = os.path.join(directory, "atlas.json")
+            SpriteAtlas.build(sizes, filename, index_filename)
+            atlas = SpriteAtlas.load(filename, index_filename)
+            assert atlas is not None
+
+            for name, name_sizes in sizes.items():
+                for size in name_sizes:
+                    packed = atlas.get(name, size)
+                    decoded = load_png_sprites(name, size)
+                    assert packed is not None
+                    self.assertEqual(len(packed), len(decoded))
+                    for a, b in zip(packed, decoded):
+                        self.assertTrue((a.image == b.image).all())
+                        self.assertTrue((a.foreground_mask == b.foreground_mask).all())
+                        self.assertTrue((a.background_mask == b.background_mask).all())
+
+            self.assertIsNone(atlas.get("A", (1, 1)))
+            del atlas
@@ -0,0 +1,33 @@
+import unittest
+
+from baba_text.sprite_cache import SpriteCache
+from baba_text.constants import COLOR_PALETTE
+
+
+class TestSpriteCache(unittest.TestCase):
+    def test_repeated_lookup_hits(self):
+        cache = SpriteCache()
+        first = cache.get("A", (20, 25))
+        second = cache.get("A", (20, 25))
+
+        self.assertEqual(cache.stats.misses, 1)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(len(first), len(second))
+
+    def test_recolor_does_not_touch_cache(self):
+        cache = SpriteCache()
+        sprite = cache.get("A", (20, 25))[0]
+        sprite.set_foreground_color(COLOR_PALETTE["red"])
+        fresh = cache.get("A", (20, 25))[0]
+
+        self.assertFalse((sprite.image == fresh.image).all())
+
+    def test_eviction(self):
+        cache = SpriteCache(max_entries=1)
+        cache.get("A", (20, 25))
+        cache.get("B", (20, 25))
+        cache.get("A", (20, 25))
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats.evictions, 2)
+        self.assertEqual(cache.stats.misses, 3)
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from baba_text.text_batch import TextJob, parse_text_jobs, run_text_jobs
+
+
+class TestTextBatch(unittest.TestCase):
+    def test_parse_jobs(self):
+        jobs = parse_text_jobs(
+            [
+                "baba is You\\nkeke",
+                "",
+                '{"text": "rock is Push", "output": "rock.gif", "seed": 2}',
+                '{"text": "flag is Win", "format": "webp"}',
+            ],
+            "out",
+            solid=True,
+            seed=1,
+        )
+        self.assertEqual(
+            jobs,
+            [
+                TextJob("baba is You\nkeke", os.path.join("out", "1.gif"), True, 1),
+                TextJob("rock is Push", os.path.join("out", "rock.gif"), True, 2),
+                TextJob("flag is Win", os.path.join("out", "4.webp"), True, 1, "webp"),
+            ],
+        )
+        with self.assertRaises(ValueError):
+            parse_text_jobs(['{"output": "no_text.gif"}'])
+        with self.assertRaises(ValueError):
+            parse_text_jobs(['{"text": "baba", "format": "bmp"}'])
+
+        errors = []
+        lines = [
+            "baba",
+            "{not json",
+            '{"text": 1}',
+            '{"text": "x", "output": 5}',
+            '{"text": "x", "format": [1]}',
+            '{"text": "x", "solid": "false"}',
+            '{"text": "x", "seed": "1"}',
+            '{"text": "x", "seed": true}',
+            "keke",
+        ]
+        jobs = parse_text_jobs(lines, "out", errors=errors)
+        self.assertEqual([job.text for job in jobs], ["baba", "keke"])
+        self.assertEqual(
+            [e.job.output_file for e in errors],
+            [os.path.join("out", f"{number}.gif") for number in range(2, 9)],
+        )
+        self.assertTrue(all(not e.ok and e.error.startswith("Line") for e in errors))
+
+    def test_failing_jobs_are_isolated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = parse_text_jobs(["baba is You", "\U0001f600", "keke"], directory)
+            for worker_count in (1, 2):
+                done = []
+                results = run_text_jobs(jobs, worker_count, done.append)
+
+                self.assertEqual(len(done), 3)
+                self.assertEqual([r.ok for r in results], [True, False, True])
+                self.assertIn("illegal character", results[1].error)
+                self.assertTrue(os.path.exists(jobs[2].output_file))
@@ -0,0 +1,24 @@
+import unittest
+from io import BytesIO
+
+import numpy as np
+from baba_text.video_frames import iter_video_frames
+from baba_text.constants import ANIMATION_FPS
+from PIL import Image
+
+
+class TestVideoFrames(unittest.TestCase):
+    def test_frames_are_streamed(self):
+        source = BytesIO()
+        frames = [Image.new("RGB", (12, 8), (i * 40, 0, 0)) for i in range(4)]
+        frames[0].save(
+            source, format="gif", save_all=True, append_images=frames[1:], duration=50
+        )
+        source.seek(0)
+
+        decoded = iter_video_frames(source)
+        frame, duration = next(decoded)
+        self.assertIsInstance(frame, np.ndarray)
+        self.assertEqual(frame.shape[:2], (8, 12))
+        self.assertEqual(duration, 1000 / ANIMATION_FPS)
+        self.assertEqual(len(list(decoded)), 3)
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+
+from baba_text.word_tiles import WordTileCache
+from baba_text.animated_word import AnimatedWord
+from baba_text.rect import Rect
+from baba_text.constants import (
+    COLOR_PALETTE,
+    TRANSPARENT_COLOR,
+    SPRITE_SIZE,
+    WORD_TILE_VARIANTS,
+)
+
+
+class TestWordTiles(unittest.TestCase):
+    def test_tiles_match_animated_word(self):
+        text_color, sprite_color = COLOR_PALETTE["red"], COLOR_PALETTE["blue"]
+        box = Rect(SPRITE_SIZE, 2 * SPRITE_SIZE, SPRITE_SIZE, SPRITE_SIZE)
+        word = AnimatedWord(
+            "baba",
+            box,
+            text_color,
+            sprite_color,
+            TRANSPARENT_COLOR,
+            WordTileCache.get_variant_rng("baba", 1),
+        )
+        lookup = np.array([TRANSPARENT_COLOR, sprite_color, text_color], np.uint8)
+
+        for tile in WordTileCache().get("baba", 1):
+            screen = np.zeros((3 * SPRITE_SIZE, 2 * SPRITE_SIZE, 4), np.uint8)
+            word.draw(screen)
+            word.advance_animation()
+            self.assertTrue((screen[box.top :, box.left :] == lookup[tile]).all())
+
+    def test_warm_and_evict(self):
+        cache = WordTileCache(max_entries=WORD_TILE_VARIANTS)
+        cache.warm(["is"])
+        cache.get("is", 0)
+        self.assertEqual(cache.stats.misses, WORD_TILE_VARIANTS)
+        self.assertEqual(cache.stats.hits, 1)
+
+        cache.get("and", 0)
+        self.assertEqual(len(cache), WORD_TILE_VARIANTS)
+        self.assertEqual(cache.stats.evictions, 1)